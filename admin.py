@@ -0,0 +1,12 @@
+import hmac
+import os
+
+# --- Admin Access ---
+# The admin page is hidden from the navigation and only listed for ?admin=<EHS_ADMIN_TOKEN>.
+ADMIN_QUERY_PARAM = "admin"
+ADMIN_TOKEN = os.environ.get("EHS_ADMIN_TOKEN", "")
+
+
+def is_admin(token):
+    """Returns whether `token` opens the admin page. Without EHS_ADMIN_TOKEN, the page is disabled."""
+    return bool(ADMIN_TOKEN) and bool(token) and hmac.compare_digest(token, ADMIN_TOKEN)
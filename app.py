@@ -1,90 +1,34 @@
-import streamlit as st
-import qrcode
-from io import BytesIO
-from PIL import Image
-import smtplib
-from email.mime.text import MIMEText
-
-# Imerys Brand Colors (Based on imerys.com, accessibility-adjusted)
-IMERYS_BLUE = "#002F6C"
-IMERYS_LIGHT_BLUE = "#4DBCE9"
-IMERYS_GRAY = "#4A4A4A"
-IMERYS_WHITE = "#FFFFFF"
-IMERYS_OFF_WHITE = "#F9F9F9"
-
-# --- Quiz Questions and Answers ---
-quiz_questions = [
-    {
-        "question": "L'accès au site est:",
-        "options": ["Libre à tous", "Strictement réservé aux personnes autorisées", "Autorisé avec badge uniquement"],
-        "answer_index": 1,
-    },
-    {
-        "question": "Est-il permis de fumer partout sur le site?",
-        "options": ["Oui", "Non, seulement dans les zones fumeurs", "Non, c'est totalement interdit"],
-        "answer_index": 1,
-    },
-    {
-        "question": "Quel est le rôle du CPPT?",
-        "options": ["Gérer les finances de l'entreprise", "Donner des avis sur la politique de bien-être des travailleurs", "Organiser les événements sociaux"],
-        "answer_index": 1,
-    },
-    {
-        "question": "Les SERIOUS 7 sont:",
-        "options": ["7 règles de sécurité non importantes", "7 règles primordiales de sécurité", "7 options de restauration sur le site"],
-        "answer_index": 1,
-    },
-    {
-        "question": "Que signifie LOTOTO (S03)?",
-        "options": ["Lock-out Tag-out Try-out", "Leave Out, Tag-Out, Turn-Over", "Load Out, Transport, Offload, Test, Operate"],
-        "answer_index": 0,
-    },
-    {
-        "question": "Qui est autorisé à effectuer des tâches électriques (S04)?",
-        "options": ["Toute personne formée", "Seule une personne qualifiée et habilitée", "Les électriciens uniquement"],
-        "answer_index": 1,
-    },
-    {
-        "question": "Concernant les équipements mobiles (S11), qu'est-ce qui est important?",
-        "options": ["Avoir son permis de conduire", "Avoir l'autorisation de compétence de l'Employeur", "Avoir des chaussures de sécurité"],
-        "answer_index": 1,
-    },
-    {
-        "question": "À partir de quelle hauteur le travail est-il considéré 'en hauteur' (S13)?",
-        "options": ["Plus de 1 mètre", "Plus de 2 mètres", "Plus de 3 mètres"],
-        "answer_index": 1,
-    },
-    {
-        "question": "Que faire face à un produit ou substance dangereuse?",
-        "options": ["Ignorer si l'étiquette est illisible", "Prendre connaissance des consignes de sécurité sur la Fiche DSS", "Utiliser sans protection si on est pressé"],
-        "answer_index": 1,
-    },
-    {
-        "question": "Le Take 5 est un outil pour:",
-        "options": ["Faire une pause de 5 minutes", "Réfléchir aux actions avant de réaliser une tâche", "Organiser une réunion de 5 personnes"],
-        "answer_index": 1,
-    }
-]
-
-
-def generate_qr_code(text):
-    """Generates a QR code image from the given text."""
-    qr = qrcode.QRCode(
-        version=1,
-        error_correction=qrcode.constants.ERROR_CORRECT_L,
-        box_size=10,
-        border=4,
-    )
-    qr.add_data(text)
-    qr.make(fit=True)
-    img = qr.make_image(fill_color="black", back_color="white")
-    return img
-
+import contextlib
+import datetime
+import functools
+import time
 
-def send_email(name, company, email, score, total_questions, recipient_email):
-    """Sends an email with quiz results."""
-    sender_email = "your_sender_email@example.com"  # Replace with your sender email
-    sender_password = "your_sender_password"  # Replace with your sender email password or app password
+import streamlit as st
+from streamlit.runtime.scriptrunner import get_script_run_ctx
+
+from admin import ADMIN_QUERY_PARAM, is_admin
+from assets import CONTENT_IMAGE_WIDTH, LOGO_WIDTH, asset_registry
+from metrics import (
+    Profile,
+    available_profilers,
+    is_enabled,
+    metrics,
+    set_enabled,
+    span,
+    start_metrics_server,
+    timed,
+)
+from sessions import UserInfo, clear_session_state, get_session_registry
+from sites import SITE_QUERY_PARAM, get_site, load_sites, site_css
+from warmup import record_first_render, start_warmup, startup_report
+
+# Modules pulling in qrcode, PIL, OpenCV, smtplib or email.mime are imported by the
+# page that needs them, so a worker serving only "Bienvenue" never loads them.
+
+@timed("send_email")
+def send_email(name, company, email, score, total_questions, recipient_email, site_name="Lixhe"):
+    """Queues an email with quiz results for background delivery."""
+    from mailer import get_delivery_queue
 
     message = f"""
     Nom: {name}
@@ -93,20 +37,151 @@ def send_email(name, company, email, score, total_questions, recipient_email):
     Score du quiz de sécurité: {score}/{total_questions}
     """
 
-    msg = MIMEText(message)
-    msg['Subject'] = "Résultats du Quiz d'Induction de Sécurité - Imerys Lixhe"
-    msg['From'] = sender_email
-    msg['To'] = recipient_email
-
     try:
-        with smtplib.SMTP_SSL('smtp.gmail.com', 465) as server:  # Or your SMTP server
-            server.login(sender_email, sender_password)
-            server.sendmail(sender_email, recipient_email, msg.as_string())
-        return True, None  # Success, no error
+        get_delivery_queue().enqueue(
+            recipient_email, f"Résultats du Quiz d'Induction de Sécurité - Imerys {site_name}", message
+        )
+        return True, None  # Queued, delivery and retries happen in the background
     except Exception as e:
         return False, str(e)  # Failure, return error message
 
 
+def show_asset(path, display_width, missing_message, **image_kwargs):
+    """Displays a cached, pre-sized image, or a warning if the file is missing."""
+    asset = asset_registry.get(path, display_width)
+    if asset is None:
+        st.warning(missing_message)
+    else:
+        st.image(asset.data, **image_kwargs)
+
+
+def touch_session():
+    """Records this session's activity. True if it was evicted while idle: its state is cleared here."""
+    ctx = get_script_run_ctx()
+    if ctx is None or not get_session_registry().touch(ctx.session_id):
+        return False
+    # Cleared from this session's own script thread, never by another session
+    if not clear_session_state(ctx.session_state):
+        st.session_state.clear()  # Streamlit internals moved: user values and widget values only
+    st.session_state["session_expired"] = True  # Shown by main(), also when a fragment rerun got here first
+    return True
+
+
+def on_quiz_submit(state, site, user):
+    """Scores the submitted answers and, when all questions are answered, stores the result once."""
+    from quiz import bank_fingerprint, encode_answers, record_answer
+    from results_store import InductionResult, get_results_store
+
+    quiz_questions = site.content.quiz_questions
+    for position in range(state.total):
+        record_answer(state, quiz_questions, position, st.session_state.get(f"q{position}"))
+    if state.answered < state.total:
+        return
+    # Keep a durable record so the gate can check the induction without searching inboxes,
+    # whether or not the visitor asks for the email
+    result = InductionResult(
+        user.name,
+        user.company,
+        user.email,
+        state.score,
+        state.total,
+        site=site.id,
+        answers=encode_answers(state, len(quiz_questions)),  # Per-question failure rates
+        bank_fingerprint=bank_fingerprint(quiz_questions),
+    )
+    state.result_id = get_results_store().add(result)
+    state.badge_id = result.badge_id
+
+
+def on_quiz_restart(site):
+    """Draws a new quiz after a submitted attempt, with blank answers."""
+    from quiz import start_quiz
+
+    state = st.session_state["quiz"]
+    for position in range(state.total):
+        st.session_state.pop(f"q{position}", None)
+    induction_content = site.content
+    st.session_state["quiz"] = start_quiz(
+        induction_content.quiz_questions, state.bank_id, induction_content.quiz_sample_size
+    )
+
+
+@st.fragment
+def quiz_fragment(site, user):
+    """Renders the quiz and its result; answering and submitting only rerun this fragment."""
+    from qr_codes import generate_qr_code_png
+    from quiz import start_quiz
+    from results_store import badge_payload
+
+    # Submitting reruns only this fragment, not main(). Cleared while idle: back to the form, with the notice.
+    if touch_session() or "user" not in st.session_state:
+        st.rerun(scope="app")
+    induction_content = site.content
+    quiz_questions = induction_content.quiz_questions
+    bank_id = f"{site.id}.{site.language}"
+    state = st.session_state.get("quiz")
+    if state is None or state.bank_id != bank_id:
+        state = st.session_state["quiz"] = start_quiz(quiz_questions, bank_id, induction_content.quiz_sample_size)
+
+    if state.result_id is None:
+        # The answers are only scored and stored on submission (on_quiz_submit): one stored result per attempt
+        with st.form("quiz_form"):
+            for position, question_index in enumerate(state.question_indices):
+                question_data = quiz_questions[question_index]
+                st.markdown(f"**Question {position + 1}:** {question_data['question']}")
+                st.radio(
+                    " ",
+                    range(len(question_data["options"])),
+                    format_func=question_data["options"].__getitem__,
+                    index=state.answers.get(position),  # Restores the answers of an incomplete submission
+                    key=f"q{position}",  # Unique key for each radio
+                )
+            quiz_submitted = st.form_submit_button(
+                "Valider mes réponses", on_click=on_quiz_submit, args=(state, site, user)
+            )
+
+        if quiz_submitted and state.result_id is None:  # Not stored by on_quiz_submit
+            st.error(f"Veuillez répondre à toutes les questions ({state.answered}/{state.total} répondues).")
+
+    if state.result_id is not None:  # Submitted: the score is only shown once the answers are final
+        quiz_score = state.score
+        st.markdown("---")
+        st.subheader("Résultats du Quiz")
+        st.write(f"Votre score: **{quiz_score}/{state.total}**")
+
+        if quiz_score == state.total:
+            st.success("Félicitations ! Vous avez réussi le quiz.")
+        elif quiz_score >= state.total * 0.7:  # Example passing score (70%)
+            st.warning("Vous avez presque réussi. Veuillez revoir les sections pour améliorer votre score.")
+        else:
+            st.error("Vous n'avez pas réussi le quiz. Veuillez revoir attentivement l'induction de sécurité.")
+
+        if quiz_score == state.total:
+            # The badge QR code is checked at the gate by the verification page
+            st.download_button(
+                label="Télécharger votre badge d'induction (QR)",
+                data=generate_qr_code_png(badge_payload(state.badge_id)),
+                file_name="badge_induction.png",
+                mime="image/png",
+            )
+        else:
+            st.button("Recommencer le quiz", key="restart_quiz_button", on_click=on_quiz_restart, args=(site,))
+
+        if st.button("Envoyer les résultats par email", key="send_email_button"):  # Button to send email, shown after submission
+            recipient_email = user.email  # Use email from the form
+            success, error_message = send_email(
+                user.name, user.company, user.email, quiz_score, state.total, recipient_email, site.name
+            )
+            if success:
+                st.success("Résultats mis en file d'envoi, l'email partira dans quelques instants.")
+            else:
+                st.error(f"Erreur lors de l'envoi de l'email: {error_message}")
+                st.error("Veuillez vérifier votre connexion internet et les informations de messagerie.")
+
+            # Security Warning - VERY IMPORTANT
+            st.warning("⚠️ **Important: Les informations d'identification de l'email sont lues dans les variables d'environnement (EHS_SENDER_EMAIL, EHS_SENDER_PASSWORD) et valent par défaut des valeurs d'exemple.**  Pour une application réelle, il est **crucial** de les fournir de manière sécurisée (variables d'environnement, gestion des secrets) et d'utiliser un service d'envoi d'emails robuste et sécurisé.  **Ne jamais coder en dur des informations sensibles dans une application de production.**")
+
+
 def main():
     """Streamlit app with Imerys branding and French localization."""
 
@@ -118,332 +193,462 @@ def main():
         initial_sidebar_state="expanded",
     )
 
-    # --- Theme Customization ---
-    st.markdown(
-        f"""
-        <style>
-        /* General app background and text */
-        .stApp {{
-            background-color: {IMERYS_OFF_WHITE};
-            color: {IMERYS_GRAY};
-        }}
-        [data-testid="stHeader"] {{
-            background-color: {IMERYS_BLUE};
-            color: {IMERYS_WHITE};
-        }}
-        [data-testid="stSidebar"] {{
-            background-color: {IMERYS_BLUE};
-            color: {IMERYS_WHITE};
-        }}
-        [data-testid="stSidebar"] h1, [data-testid="stSidebar"] h2, [data-testid="stSidebar"] h3 {{
-            color: {IMERYS_WHITE};
-        }}
-        [data-testid="stSidebar"] a {{
-            color: {IMERYS_LIGHT_BLUE};
-        }}
-        [data-testid="stSidebar"] a:hover {{
-            color: {IMERYS_WHITE};
-        }}
-        [data-testid="stSidebar"] [aria-current="true"] {{
-            color: {IMERYS_WHITE};
-            background-color: rgba(255, 255, 255, 0.2);
-        }}
-        .stTextInput > label {{
-            color: {IMERYS_BLUE};
-        }}
-        .stTextInput > div > input {{
-            border: 2px solid {IMERYS_LIGHT_BLUE};
-            border-radius: 0.25rem;
-            padding: 0.5rem;
-            color: {IMERYS_GRAY};
-            background-color: {IMERYS_WHITE};
-        }}
-        .stNumberInput > label {{
-            color: {IMERYS_BLUE};
-        }}
-       .stNumberInput > div > input {{
-            border: 2px solid {IMERYS_LIGHT_BLUE};
-            border-radius: 0.25rem;
-            padding: 0.5rem;
-            color: {IMERYS_GRAY};
-            background-color: {IMERYS_WHITE};
-        }}
-        .stDownloadButton > button {{
-            background-color: {IMERYS_BLUE};
-            color: {IMERYS_WHITE};
-            border: none;
-            border-radius: 0.25rem;
-            padding: 0.5rem 1rem;
-            font-weight: bold;
-        }}
-        .stDownloadButton > button:hover {{
-            background-color: {IMERYS_LIGHT_BLUE};
-            color: {IMERYS_WHITE};
-        }}
-        h1, h2, h3, h4, h5, h6 {{
-            color: {IMERYS_BLUE};
-        }}
-        </style>
-        """,
-        unsafe_allow_html=True,
-    )
+    touch_session()
+    if st.session_state.pop("session_expired", False):
+        st.info("Votre session a expiré après une période d'inactivité. Veuillez recommencer.")
+
+    # --- Site Selection (?site=<id>, defaults to the first plant) ---
+    sites, _ = load_sites()
+    site = get_site(st.query_params.get(SITE_QUERY_PARAM))
+    if len(sites) > 1:
+        site = sites[
+            st.sidebar.selectbox(
+                "Site :", list(sites), index=list(sites).index(site.id), format_func=lambda site_id: sites[site_id].name
+            )
+        ]
+        st.query_params[SITE_QUERY_PARAM] = site.id
+    branding = site.branding
+    induction_content = site.content
+
+    # --- Theme Customization (rendered once per site) ---
+    with span("css_inject"):
+        st.markdown(site_css(site.id), unsafe_allow_html=True)
 
     # --- Sidebar Navigation ---
     st.sidebar.header("Navigation")
-    page = st.sidebar.radio(
-        "Choisissez une page :",
-        [
-            "Bienvenue",
-            "Générateur de code QR",
-            "Induction de sécurité",
-            "Générateur de permis de travail",
-        ],
-    )
+    pages = [
+        "Bienvenue",
+        "Générateur de code QR",
+        "Induction de sécurité",
+        "Générateur de permis de travail",
+        "Vérification des codes QR",
+    ]
+    if is_admin(st.query_params.get(ADMIN_QUERY_PARAM)):
+        pages += ["Administration", "Rapports de conformité"]  # Hidden unless the URL carries the admin token
+    page = st.sidebar.radio("Choisissez une page :", pages)
 
     # --- Page Content ---
     if page == "Bienvenue":
         # --- Welcome Page ---
         col1, col2 = st.columns([1, 3])
         with col1:
-            try:
-                imerys_logo = Image.open("imerys_logo.png")
-                st.image(imerys_logo, width=150)
-            except FileNotFoundError:
-                st.warning("Logo Imerys non trouvé. Placez 'imerys_logo.png' dans le même répertoire.")
+            show_asset(site.logo, LOGO_WIDTH, f"Logo Imerys non trouvé. Placez '{site.logo}' dans le même répertoire.", width=LOGO_WIDTH)
 
         with col2:
-            st.title("Bienvenue sur les ressources EHS Imerys - Site de Lixhe")
-            st.markdown(f"<p style='color:{IMERYS_GRAY};'>Votre portail pour les informations essentielles en matière de santé et de sécurité.</p>", unsafe_allow_html=True)
-            st.markdown(f"<p style='color:{IMERYS_GRAY};'>Veuillez sélectionner une option dans le menu de navigation à gauche.</p>", unsafe_allow_html=True)
+            st.title(f"Bienvenue sur les ressources EHS Imerys - Site de {site.name}")
+            st.markdown(f"<p style='color:{branding.gray};'>Votre portail pour les informations essentielles en matière de santé et de sécurité.</p>", unsafe_allow_html=True)
+            st.markdown(f"<p style='color:{branding.gray};'>Veuillez sélectionner une option dans le menu de navigation à gauche.</p>", unsafe_allow_html=True)
 
-        try:
-            site_image = Image.open("imerys_lixhe.jpg")
-            st.image(site_image, caption="Site de Lixhe", use_column_width=True)
-        except FileNotFoundError:
-            st.warning("Image du site non trouvée. Placez 'imerys_lixhe.jpg' dans le même répertoire.")
+        if site.site_image:
+            show_asset(site.site_image, CONTENT_IMAGE_WIDTH, f"Image du site non trouvée. Placez '{site.site_image}' dans le même répertoire.", caption=f"Site de {site.name}", width="stretch")
 
     elif page == "Générateur de code QR":
         # --- QR Code Generator Page ---
-        st.header("Générateur de code QR")
-        text = st.text_input("Entrez le texte ou l'URL:", "https://www.imerys.com")
-        if text:
-            qr_image = generate_qr_code(text)
-
-            # Convert PIL Image to bytes for display
-            img_buffer = BytesIO()
-            qr_image.save(img_buffer, format="PNG")
-            img_bytes = img_buffer.getvalue()
-
-            # Display the QR code using bytes data
-            st.image(img_bytes, caption="Code QR généré", use_column_width=True)
-
-            # Add a download button
-            img_buffer_download = BytesIO()  # Use a separate buffer for the download to avoid conflicts
-            qr_image.save(img_buffer_download, format="PNG")
-            img_bytes_download = img_buffer_download.getvalue()
+        from qr_batch import build_batch_archive, parse_batch_input
+        from qr_codes import DEFAULT_TEXT, generate_qr_code_png, generate_qr_code_svg_bytes
 
-            st.download_button(
-                label="Télécharger le code QR",
-                data=img_bytes_download,
-                file_name="qr_code.png",
-                mime="image/png",
+        st.header("Générateur de code QR")
+        qr_mode = st.radio("Mode :", ["Code unique", "Lot (CSV ou liste)"], horizontal=True)
+
+        if qr_mode == "Code unique":
+            text = st.text_input("Entrez le texte ou l'URL:", DEFAULT_TEXT)
+            if text:
+                # PNG bytes are cached per content, so the preview and the download share one encode
+                img_bytes = generate_qr_code_png(text)
+
+                # Display the QR code using bytes data
+                st.image(img_bytes, caption="Code QR généré", width="stretch")
+
+                # Add a download button
+                st.download_button(
+                    label="Télécharger le code QR",
+                    data=img_bytes,
+                    file_name="qr_code.png",
+                    mime="image/png",
+                )
+                st.download_button(
+                    label="Télécharger le code QR (SVG)",
+                    data=generate_qr_code_svg_bytes(text),
+                    file_name="qr_code.svg",
+                    mime="image/svg+xml",
+                )
+
+        else:
+            # --- Batch Mode ---
+            st.write(
+                "Une ligne par code, encodée telle quelle. Pour ajouter une étiquette, commencez par l'en-tête "
+                "`donnée,étiquette` ou cochez la case ci-dessous (virgule, point-virgule ou tabulation)."
             )
+            uploaded_file = st.file_uploader("Fichier CSV ou texte", type=["csv", "txt"])
+            batch_text = st.text_area("Ou collez la liste ici :", height=200)
+            with_labels = st.checkbox("CSV avec étiquettes : la 2e colonne est l'étiquette")
+            output_format = st.radio("Format de sortie :", ["ZIP (PNG)", "PDF imprimable"], horizontal=True)
+
+            if st.button("Générer le lot"):
+                try:
+                    raw_text = uploaded_file.getvalue().decode("utf-8-sig") if uploaded_file else batch_text
+                    items = parse_batch_input(raw_text, with_labels)
+                    batch_error = None if items else "Aucune donnée à encoder."
+                except UnicodeDecodeError:
+                    items, batch_error = [], "Le fichier doit être encodé en UTF-8 (CSV UTF-8 dans Excel)."
+                if batch_error:
+                    st.error(batch_error)
+                else:
+                    batch_progress = st.progress(0)
+
+                    def update_batch_progress(done, total):
+                        # Only send a delta to the browser when the displayed percentage changes
+                        if done == total or done * 100 // total != (done - 1) * 100 // total:
+                            batch_progress.progress(done / total, text=f"{done}/{total} codes QR générés")
+
+                    is_pdf = output_format == "PDF imprimable"
+                    with build_batch_archive(items, "pdf" if is_pdf else "zip", update_batch_progress) as archive:
+                        archive_bytes = archive.read()
+                    st.success(f"{len(items)} codes QR générés.")
+                    st.download_button(
+                        label="Télécharger le lot",
+                        data=archive_bytes,
+                        file_name="qr_codes.pdf" if is_pdf else "qr_codes.zip",
+                        mime="application/pdf" if is_pdf else "application/zip",
+                    )
 
     elif page == "Induction de sécurité":
         # --- Safety Induction Page ---
-        st.header("Induction de sécurité - Site de Lixhe")
+        st.header(f"Induction de sécurité - Site de {site.name}")
         st.subheader("Induction de Sécurité Interactive")
         st.write("Veuillez remplir le formulaire ci-dessous, suivre les sections d'induction, et compléter le quiz à la fin.")
 
         # --- User Information Form (FIRST STEP) ---
         with st.form("user_info_form"):
             st.subheader("Informations Personnelles")
-            name = st.text_input("Nom *", key="name_input")  # Added key for state persistence
-            company = st.text_input("Entreprise *", key="company_input")  # Added key for state persistence
-            email = st.text_input("Adresse e-mail *", key="email_input")  # Added key for state persistence
+            # Unkeyed: once submitted, the values are kept in one UserInfo rather than in three widget keys
+            name = st.text_input("Nom *")
+            company = st.text_input("Entreprise *")
+            email = st.text_input("Adresse e-mail *")
             user_info_submitted = st.form_submit_button("Valider les informations personnelles")
 
         if user_info_submitted:  # Only proceed if user info is submitted
             if not name or not company or not email:
                 st.error("Veuillez remplir tous les champs obligatoires.")
             else:
-                st.session_state['user_info_submitted'] = True  # Track form submission in session state
-        elif 'user_info_submitted' not in st.session_state:
-            st.session_state['user_info_submitted'] = False  # Initialize session state
+                st.session_state["user"] = UserInfo(name, company, email)  # Kept once, for the whole session
 
-        if st.session_state['user_info_submitted']:  # Show induction content and quiz only after form submission
+        user = st.session_state.get("user")
+        if user is not None:  # Show induction content and quiz only after form submission
 
             progress_bar = st.progress(0)  # Progress bar initialization
-            total_sections = 9  # Number of induction sections + Quiz
-            section_percentage = 100 / total_sections
+            section_percentage = 100 / induction_content.total_steps  # Induction sections + Quiz
             progress_value = 0
 
-            induction_section = st.radio(
-                "Choisissez une section de l'induction :",
-                [
-                    "Introduction",
-                    "L'accès au site",
-                    "L'Environnement",
-                    "La Sécurité d'Entreprise",
-                    "Les SERIOUS 7",
-                    "Produits et Substances Dangereuses",
-                    "Take 5",
-                    "Conclusion",
-                    "Quiz de compréhension"  # Quiz is now a section
-                ], index=0
-            )
-
-            if induction_section == "Introduction":
-                st.subheader("Introduction")
-                st.write("La santé et la sécurité sont l'une des valeurs essentielles chez Imerys.")
-                st.write("Ce livret est destiné à toute personne entrant en fonction au sein d'Imerys Minéraux Belgique et ce peu importe le statut.")
-                st.write("Employés Imerys, Etudiants, Sociétés extérieures.")
-                st.write("*La sécurité, la santé et le bien-être n'ont pas de statut chez Imerys.*")
-                st.write("La direction, Monsieur Dazza CEO, a rédigé une charte santé et sécurité afin de positionner la vision d'Imerys.")
-                progress_value = section_percentage * 1
-            elif induction_section == "L'accès au site":
-                st.subheader("L'accès au site")
-                st.write("L'accès au site est strictement réservé aux personnes autorisées :")
-                st.write("- Soit en tant que qu'employé")
-                st.write("- Soit en tant que visiteur (un accompagnement est obligatoire)")
-                st.write("- Soit en tant que technicien (un accueil sécurité et environnement est obligatoire)")
-                st.write("Aujourd'hui nous avons Cognibox (passeport sécurité)")
-                st.write("Tout accès au site aussi bien pour un visiteur qu'un technicien nécessite un enregistrement.")
-                st.write("- Cahier de présence aux entrées site (TC, bâtiment usine)")
-                st.write("- Il est interdit de fumer dans les installations (Privilégiez les abris fumeurs)")
-                try:
-                    site_access_image = Image.open("site_access_image.png")  # Replace with actual image
-                    st.image(site_access_image, caption="Accès au Site", use_column_width=True)
-                except FileNotFoundError:
-                    st.warning("Image d'accès au site non trouvée (site_access_image.png).")
-                progress_value = section_percentage * 2
-            elif induction_section == "L'Environnement":
-                st.subheader("L'environnement")
-                st.write("Depuis 2018, Imerys applique le tri sélectif de ses déchets afin de garantir au maximum leurs bonnes valorisations.")
-                st.write("Il est demandé à chacun d'entre nous de s'impliquer en bon père de famille.")
-                st.write("- Je place les déchets au bon endroits")
-                st.write("- Je ne laisse pas des déchets traîner et ramasse ce qui traine (par oubli ou perte)")
-                st.write("- Je nettoie mon emplacement lorsque je le quitte")
-                st.subheader("La gestion des énergies")
-                st.write("Par << Energie >>, il est sous-entendu toute consommation d'une ressource ayant une incidence sur l'Environnement lorsqu'elle est utilisée.")
-                st.write("Chaque action, tâche qui nécessite/utilise de l'énergie donne lieu à un aspect environnemental qui peut avoir un impact sur l'Environnement Relation de cause à effet.")
-                st.write("Exemples :")
-                st.write("- Ne pas faire fonctionner la climatisation les fenêtres ouvertes")
-                st.write("- Couper les moteurs d'une machine qui ne fonctionne pas")
-                st.write("- Éteindre les lumières lorsqu'elles ne sont pas utilisées")
-                st.write("- Signaler toute fuite d'eau")
-                st.write("- Couper son chauffage en quittant son lieu de travail")
-                try:
-                    environment_image = Image.open("environment_image.png")  # Replace with actual image
-                    st.image(environment_image, caption="Environnement", use_column_width=True)
-                except FileNotFoundError:
-                    st.warning("Image d'environnement non trouvée (environment_image.png).")
-                progress_value = section_percentage * 3
-            elif induction_section == "La Sécurité d'Entreprise":
-                st.subheader("La sécurité d'une entreprise est régie par différents organes")
-                st.write("Le CPPT: Comités pour la prévention et la protection au travail. Émet des avis et des propositions sur la politique du Bien-être des travailleurs lors de l'exécution de leur travail, sur le plan global de prévention et le plan annuel d'actions.")
-                st.write("Le CE : Comité d'entreprise. Émet des avis sur les orientations stratégiques, l'organisation du temps de travail, les besoins en formations, la politique sociale ainsi que les conditions de travail.")
-                st.write("Le SIPP: Service Interne pour la Prévention et la Protection au travail. Le service interne a pour mission générale d'assister l'employeur, les membres de la ligne hiérarchique et les travailleurs de l'entreprise dans l'application de la réglementation relative au bien-être des travailleurs mais également dans la réalisation des mesures et activités de prévention.")
-                st.write("Le SEPP : Service externe pour la prévention et la protection au travail. Représenté chez Imerys Lixhe par le CESI. Assiste l'entreprise pour des missions pour lesquelles il n'en a pas les compétences en matière de santé et de bien-être. (surveillance santé, hygiène, ergonomie...)")
-                try:
-                    safety_org_image = Image.open("safety_org_image.png")  # Replace with actual image
-                    st.image(safety_org_image, caption="Organes de Sécurité", use_column_width=True)
-                except FileNotFoundError:
-                    st.warning("Image des organes de sécurité non trouvée (safety_org_image.png).")
-                progress_value = section_percentage * 4
-            elif induction_section == "Les SERIOUS 7":
-                st.subheader("Règles primordiales d'Imerys - Les SERIOUS 7")
-                # --- (SERIOUS 7 content - unchanged) ---
-                serious_7_subsection = st.selectbox("Plus de détails sur les Serious 7:", ["Aucun", "S03 - LOTOTO", "S04 - Sécurité électrique", "S10 - Protection machine", "S11 - Équipement mobile", "S13 - Travail en hauteur", "S14 - Sécurisation terrain", "S19 - Chariots élévateurs"])
-                if serious_7_subsection == "S03 - LOTOTO":
-                    st.subheader("S03 - Lock-out Tag-out Try-out (LOTOTO)")
-                    # --- (LOTOTO content - unchanged) ---
-                # --- (rest of SERIOUS 7 subsections - unchanged) ---
-                progress_value = section_percentage * 5
-
-            elif induction_section == "Produits et Substances Dangereuses":
-                st.subheader("Les produits et substances dangereuses")
-                # --- (Produits et Substances Dangereuses content - unchanged) ---
-                try:
-                    danger_symbols_image = Image.open("danger_symbols_image.png")  # Replace with actual image
-                    st.image(danger_symbols_image, caption="Pictogrammes de Danger", use_column_width=True)
-                except FileNotFoundError:
-                    st.warning("Image des pictogrammes de danger non trouvée (danger_symbols_image.png).")
-                progress_value = section_percentage * 6
-
-            elif induction_section == "Take 5":
-                st.subheader("Take 5")
-                # --- (Take 5 content - unchanged) ---
-                try:
-                    take5_image = Image.open("take5_image.png")  # Replace with actual image
-                    st.image(take5_image, caption="Take 5", use_column_width=True)
-                except FileNotFoundError:
-                    st.warning("Image Take 5 non trouvée (take5_image.png).")
-                progress_value = section_percentage * 7
-
-            elif induction_section == "Conclusion":
-                st.subheader("Conclusion")
-                # --- (Conclusion content - unchanged) ---
-                progress_value = section_percentage * 8
-
-            elif induction_section == "Quiz de compréhension": # Quiz section
-                progress_value = section_percentage * 9
+            induction_section = st.radio(induction_content.section_prompt, induction_content.section_titles, index=0)
+
+            section = induction_content.sections.get(induction_section)
+            if section is not None:
+                # The whole section text goes to the browser as one pre-rendered element
+                st.markdown(section.markdown)
+                if section.subsections:
+                    subsection = st.selectbox(
+                        section.subsection_prompt, [section.subsection_placeholder, *section.subsections]
+                    )
+                    if subsection in section.subsections:
+                        st.markdown(section.subsections[subsection])
+                if section.image:
+                    show_asset(
+                        section.image.path,
+                        CONTENT_IMAGE_WIDTH,
+                        section.image.missing_message,
+                        caption=section.image.caption,
+                        width="stretch",
+                    )
+                progress_value = section_percentage * section.position
+
+            else:  # Quiz section
+                progress_value = section_percentage * induction_content.total_steps
                 st.markdown("---")
-                st.subheader("Quiz de compréhension")
-                st.write("Répondez aux questions suivantes pour tester vos connaissances.")
-
-                quiz_score = 0
-                user_answers = []
-
-                for i, question_data in enumerate(quiz_questions):
-                    question_number = i + 1
-                    st.markdown(f"**Question {question_number}:** {question_data['question']}")
-                    user_answer_index = st.radio(f" ", question_data["options"], index=None, key=f"q{i}")  # Unique key for each radio
-                    user_answers.append(user_answer_index)  # Store answer index
-
-                if any(answer is not None for answer in user_answers):  # Check if any question has been answered
-                    for i, question_data in enumerate(quiz_questions):
-                        if user_answers[i] == question_data["answer_index"]:
-                            quiz_score += 1
-
-                    st.markdown("---")
-                    st.subheader("Résultats du Quiz")
-                    st.write(f"Votre score: **{quiz_score}/{len(quiz_questions)}**")
-
-                    if quiz_score == len(quiz_questions):
-                        st.success("Félicitations ! Vous avez réussi le quiz.")
-                    elif quiz_score >= len(quiz_questions) * 0.7:  # Example passing score (70%)
-                        st.warning("Vous avez presque réussi. Veuillez revoir les sections pour améliorer votre score.")
-                    else:
-                        st.error("Vous n'avez pas réussi le quiz. Veuillez revoir attentivement l'induction de sécurité.")
-
-                    if st.button("Envoyer les résultats par email", key="send_email_button", disabled=False):  # Button to send email, enabled after quiz
-                        recipient_email = email  # Use email from the form
-                        success, error_message = send_email(name, company, email, quiz_score, len(quiz_questions), recipient_email)
-                        if success:
-                            st.success("Résultats envoyés par email avec succès!")
-                        else:
-                            st.error(f"Erreur lors de l'envoi de l'email: {error_message}")
-                            st.error("Veuillez vérifier votre connexion internet et les informations de messagerie.")
-
-                        # Security Warning - VERY IMPORTANT (remains unchanged)
-                        st.warning("⚠️ **Important: Les informations d'identification de l'email (sender_email, sender_password) sont actuellement codées en dur dans le code.**  Pour une application réelle, il est **crucial** de stocker ces informations de manière sécurisée (variables d'environnement, gestion des secrets) et d'utiliser un service d'envoi d'emails robuste et sécurisé.  **Ne jamais coder en dur des informations sensibles dans une application de production.**")
+                st.subheader(induction_content.quiz_title)
+                st.write(induction_content.quiz_intro)
+
+                quiz_fragment(site, user)
 
             progress_bar.progress(int(progress_value))  # Update progress bar
 
 
     elif page == "Générateur de permis de travail":
-        # --- Work Permit Generator Page (Placeholder - remains unchanged) ---
+        # --- Work Permit Generator Page ---
+        from permits import (
+            compile_template,
+            get_permit_registry,
+            load_permit_settings,
+            parse_permit_rows,
+            permits_pdf_bytes,
+        )
+
         st.header("Générateur de permis de travail")
-        st.write("Section en construction. Veuillez revenir plus tard.")
+        templates = load_permit_settings()["templates"]
+        template_id = st.selectbox(
+            "Type de permis :", list(templates), format_func=lambda template_id: templates[template_id]["title"]
+        )
+        template = templates[template_id]
+        permit_mode = st.radio("Mode :", ["Permis unique", "Lot (CSV)"], horizontal=True, key="permit_mode")
+
+        if permit_mode == "Permis unique":
+            with st.form("permit_form"):
+                values = {
+                    spec["name"]: (st.text_area if spec.get("lines", 1) > 1 else st.text_input)(spec["label"])
+                    for spec in template["fields"]
+                }
+                permit_submitted = st.form_submit_button("Générer le permis")
+            rows = []
+            if permit_submitted:
+                if values.get("holder"):
+                    rows = [values]
+                else:
+                    st.error("Veuillez indiquer le titulaire du permis.")
+        else:
+            field_names = ",".join(spec["name"] for spec in template["fields"])
+            st.write(f"Une ligne par permis, avec l'en-tête : `{field_names}`.")
+            uploaded_file = st.file_uploader("Fichier CSV", type=["csv"], key="permit_csv")
+            rows = []
+            if st.button("Générer les permis") and uploaded_file:
+                try:
+                    rows, skipped = parse_permit_rows(uploaded_file.getvalue().decode("utf-8-sig"), template_id)
+                except UnicodeDecodeError:
+                    st.error("Le fichier doit être encodé en UTF-8 (CSV UTF-8 dans Excel).")
+                except ValueError as e:
+                    st.error(str(e))
+                else:
+                    if skipped:
+                        lines = ", ".join(str(line) for line in skipped)
+                        st.warning(f"Lignes ignorées, sans titulaire du permis : {lines}.")
+                    if not rows:
+                        st.error("Aucun permis trouvé dans le fichier.")
+
+        if rows:
+            # Every permit is registered before printing, so its QR code can be verified on site
+            permits = get_permit_registry().issue_many(template_id, rows, site.id)
+            permit_progress = st.progress(0)
+
+            def update_permit_progress(done, total):
+                if done == total or done * 100 // total != (done - 1) * 100 // total:
+                    permit_progress.progress(done / total, text=f"{done}/{total} permis générés")
+
+            pdf_bytes = permits_pdf_bytes(compile_template(template_id, site.name), permits, update_permit_progress)
+            st.success(f"{len(permits)} permis générés.")
+            st.download_button(
+                label="Télécharger les permis (PDF)",
+                data=pdf_bytes,
+                file_name="permis.pdf" if len(permits) > 1 else f"{permits[0].permit_id}.pdf",
+                mime="application/pdf",
+            )
+
+    elif page == "Vérification des codes QR":
+        # --- Gate Verification Page (decoded and checked locally, no network round-trip) ---
+        from verification import STATUS_EXPIRED, STATUS_UNREADABLE, STATUS_VALID, get_credential_index
+
+        st.header("Vérification des codes QR")
+        credential_index = get_credential_index()
+        scan_source = st.radio("Source :", ["Caméra", "Image", "Saisie manuelle"], horizontal=True, key="scan_source")
+
+        scan_result = None
+        if scan_source == "Caméra":
+            frame = st.camera_input("Présentez le badge ou le permis à la caméra")
+            if frame:
+                scan_result = credential_index.scan(frame.getvalue())
+        elif scan_source == "Image":
+            frame = st.file_uploader("Photo du code QR", type=["jpg", "jpeg", "png"], key="scan_upload")
+            if frame:
+                scan_result = credential_index.scan(frame.getvalue())
+        else:
+            typed_code = st.text_input("Contenu du code QR :", key="scan_text")
+            if typed_code:
+                scan_result = credential_index.check(typed_code)
+
+        if scan_result is not None:
+            credential = scan_result.credential
+            if scan_result.status == STATUS_UNREADABLE:
+                st.warning("Aucun code QR lisible. Rapprochez le code de la caméra et évitez les reflets.")
+            elif scan_result.status == STATUS_VALID:
+                st.success(f"✅ {credential.label} valide - {credential.holder} ({credential.company})")
+            elif scan_result.status == STATUS_EXPIRED:
+                st.error(f"⛔ {credential.label} expiré - {credential.holder} ({credential.company})")
+            else:
+                st.error("⛔ Code inconnu : il n'a pas été émis par cette application.")
+            if credential is not None:
+                valid_until = time.strftime("%d/%m/%Y %H:%M", time.localtime(credential.valid_until))
+                st.write(f"Valable jusqu'au : **{valid_until}**")
+            st.caption(
+                f"Décodage {scan_result.decode_ms:.1f} ms, vérification {scan_result.lookup_ms:.2f} ms, "
+                f"{len(credential_index)} codes émis en mémoire"
+            )
+
+    elif page == "Administration":
+        # --- Admin Page: instrumentation and profiling ---
+        from qr_codes import qr_cache
+
+        st.header("Administration - Performances")
+        st.toggle(
+            "Instrumentation active (tous les utilisateurs)",
+            value=is_enabled(),
+            key="metrics_enabled",
+            on_change=lambda: set_enabled(st.session_state["metrics_enabled"]),
+        )
+        spans, counters = metrics.snapshot()
+        st.subheader("Durées")
+        if spans:
+            st.table(
+                [
+                    {
+                        "opération": name,
+                        "appels": values["count"],
+                        "moyenne (ms)": round(values["mean_ms"], 2),
+                        "max (ms)": round(values["max_ms"], 2),
+                        "total (s)": round(values["total_s"], 3),
+                    }
+                    for name, values in spans.items()
+                ]
+            )
+        else:
+            st.write("Aucune mesure. Activez l'instrumentation puis naviguez dans l'application.")
+        st.subheader("Compteurs")
+        if counters:
+            st.table([{"événement": name, "valeur": value} for name, value in counters.items()])
+        if st.button("Remettre les mesures à zéro"):
+            metrics.reset()
+            st.rerun()
+
+        st.subheader("Profilage de cette session")
+        profilers = [None, *available_profilers()]
+        st.selectbox(
+            "Profileur :",
+            profilers,
+            index=profilers.index(st.session_state.get("profiler")),
+            format_func=lambda engine: engine or "Désactivé",
+            key="profiler_choice",
+            # Copied out of the widget state, which is dropped while the admin page is not shown
+            on_change=lambda: st.session_state.update(profiler=st.session_state["profiler_choice"]),
+        )
+        st.caption("Chaque exécution de la page est profilée pour cette session uniquement; le dernier rapport s'affiche ici.")
+        if st.session_state.get("profile_report"):
+            st.code(st.session_state["profile_report"], language=None)
+
+        st.subheader("Sessions")
+        registry = get_session_registry()
+        session_stats = registry.stats()
+        st.write(
+            f"{session_stats['sessions']} sessions suivies, {session_stats['evicted']} vidées pour inactivité "
+            f"(après {registry.idle_seconds / 60:.0f} min, au-delà de {registry.max_sessions or '∞'} sessions)."
+        )
+
+        st.subheader("Cache des codes QR")
+        cache_stats = qr_cache.stats()
+        st.write(
+            f"{cache_stats['hits']} succès / {cache_stats['misses']} échecs "
+            f"(taux de succès {cache_stats['hit_rate']:.0%}), {cache_stats['size']}/{cache_stats['maxsize']} codes en mémoire."
+        )
+
+        st.subheader("Démarrage du processus")
+        st.json(startup_report())
+
+        st.subheader("Export Prometheus")
+        st.code(metrics.render_prometheus(), language=None)
+        st.caption("Avec EHS_METRICS_PORT, le même texte est servi sur http://<hôte>:<port>/metrics.")
+
+    elif page == "Rapports de conformité":
+        # --- Compliance Reports Page (admin) ---
+        from reports import (
+            STATUS_EXPIRED,
+            STATUS_NEVER_INDUCTED,
+            contractor_status,
+            export_bytes,
+            monthly_pass_rates,
+            question_failure_rates,
+            read_roster,
+        )
+
+        st.header("Rapports de conformité")
+        since_date = st.date_input("Résultats depuis le :", datetime.date.today() - datetime.timedelta(days=365))
+        roster_file = st.file_uploader(
+            "Liste des contractants (CSV avec une colonne email, optionnel)", type=["csv"], key="report_roster"
+        )
+        export_format = st.radio("Format d'export :", ["csv", "parquet"], horizontal=True, key="report_format")
+
+        if st.button("Calculer les rapports"):
+            since = time.mktime(since_date.timetuple())
+            roster = read_roster(roster_file.getvalue().decode("utf-8-sig")) if roster_file else None
+            with st.spinner("Agrégation des résultats..."):
+                started = time.perf_counter()
+                st.session_state["compliance_reports"] = {
+                    "monthly": monthly_pass_rates(since=since),
+                    "questions": question_failure_rates(since=since),
+                    "contractors": contractor_status(roster=roster),
+                    "elapsed_s": time.perf_counter() - started,
+                }
+
+        compliance_reports = st.session_state.get("compliance_reports")
+        if compliance_reports:
+            st.caption(f"Rapports calculés en {compliance_reports['elapsed_s']:.2f} s.")
+
+            st.subheader("Taux de réussite mensuel par entreprise")
+            monthly = compliance_reports["monthly"]
+            if not monthly.empty:
+                st.line_chart(monthly.pivot(index="month", columns="company", values="pass_rate"))
+            st.dataframe(monthly, hide_index=True)
+            st.download_button(
+                "Exporter",
+                functools.partial(export_bytes, monthly, export_format),  # Built only when clicked
+                f"taux_reussite.{export_format}",
+                key="export_monthly",
+            )
+
+            st.subheader("Taux d'échec par question")
+            questions = compliance_reports["questions"]
+            if not questions.empty:
+                labels = questions["site"] + " Q" + questions["question_number"].astype(str)
+                st.bar_chart(questions.set_index(labels)["failure_rate"])
+            st.dataframe(questions, hide_index=True)
+            st.download_button(
+                "Exporter",
+                functools.partial(export_bytes, questions, export_format),
+                f"echecs_questions.{export_format}",
+                key="export_questions",
+            )
+
+            st.subheader("Contractants expirés ou jamais induits")
+            contractors = compliance_reports["contractors"]
+            to_follow_up = contractors[contractors["status"].isin([STATUS_EXPIRED, STATUS_NEVER_INDUCTED])]
+            st.dataframe(to_follow_up, hide_index=True)
+            st.download_button(
+                "Exporter",
+                functools.partial(export_bytes, to_follow_up, export_format),
+                f"contractants.{export_format}",
+                key="export_contractors",
+            )
 
     # --- Footer (remains unchanged) ---
     st.markdown("---")
     st.markdown(
-        f"<p style='text-align: center; color: {IMERYS_GRAY}; font-size: small;'>Imerys EHS - Lixhe</p>",
+        f"<p style='text-align: center; color: {branding.gray}; font-size: small;'>Imerys EHS - {site.name}</p>",
         unsafe_allow_html=True,
     )
+    return page
+
+
+def run():
+    """Runs one script execution, profiled when this session asked for it on the admin page."""
+    start_metrics_server()
+    engine = st.session_state.get("profiler")
+    profile = Profile(engine) if engine else contextlib.nullcontext()
+    started = time.perf_counter()
+    try:
+        with profile, span("rerun"):
+            page = main()
+    finally:
+        if engine:
+            # Reruns and st.stop() leave main() by an exception; keep the report anyway
+            st.session_state["profile_report"] = profile.report
+    record_first_render(page, time.perf_counter() - started)
+    start_warmup()  # After the first render, so the first visitor does not share the CPU with it
 
 
 if __name__ == "__main__":
-    main()
+    run()
@@ -0,0 +1,105 @@
+import os
+import threading
+import time
+from dataclasses import dataclass
+from io import BytesIO
+
+from metrics import count, span
+
+# --- Asset Settings ---
+ASSET_DIR = os.path.dirname(os.path.abspath(__file__))
+LOGO_WIDTH = 150
+CONTENT_IMAGE_WIDTH = 960  # Widest column an induction image is shown in on the tablets
+MTIME_CHECK_INTERVAL = 2.0  # Seconds between modification-time checks of a cached image
+MISSING_RECHECK_INTERVAL = 30.0  # Seconds before probing again for an image that was not found
+JPEG_QUALITY = 85
+
+
+@dataclass
+class Asset:
+    """An image decoded, resized and re-encoded for display."""
+
+    data: bytes
+    mime: str
+    width: int
+    height: int
+
+
+class AssetRegistry:
+    """Process-wide cache of display-ready images.
+
+    Each (path, width) variant is decoded, downscaled and encoded once, then
+    served as bytes. Missing files are remembered too, so their filesystem
+    probe and error handling are not repeated on every rerun. Cached entries
+    are dropped when the file's modification time changes.
+    """
+
+    def __init__(self, base_dir=ASSET_DIR):
+        self.base_dir = base_dir
+        self._entries = {}  # (path, width) -> (asset or None, mtime, checked_at)
+        self._lock = threading.Lock()
+
+    def get(self, path, width=None):
+        """Returns the Asset for `path` downscaled to at most `width` pixels, or None if the file is missing."""
+        key = (path, width)
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(key)
+        if entry is not None:
+            asset, mtime, checked_at = entry
+            interval = MTIME_CHECK_INTERVAL if asset is not None else MISSING_RECHECK_INTERVAL
+            if now - checked_at < interval:
+                count("asset_cache_hit")
+                return asset
+            if self._mtime(path) == mtime:
+                with self._lock:
+                    self._entries[key] = (asset, mtime, now)
+                count("asset_cache_hit")
+                return asset
+
+        count("asset_cache_miss")
+        mtime = self._mtime(path)
+        if mtime is None:
+            asset = None
+        else:
+            with span("asset_load"):
+                asset = self._load(path, width)
+        with self._lock:
+            self._entries[key] = (asset, mtime, now)
+        return asset
+
+    def clear(self):
+        """Forgets every cached image."""
+        with self._lock:
+            self._entries.clear()
+
+    def _mtime(self, path):
+        try:
+            return os.stat(os.path.join(self.base_dir, path)).st_mtime_ns
+        except FileNotFoundError:
+            return None
+
+    def _load(self, path, width):
+        from PIL import Image  # Only needed to fill the cache, not to serve from it
+
+        try:
+            with Image.open(os.path.join(self.base_dir, path)) as img:
+                img.load()
+                # Photos stay JPEG; logos and drawings stay lossless PNG.
+                is_photo = img.format == "JPEG" and img.mode in ("RGB", "L", "CMYK")
+                if width and img.width > width:
+                    img = img.resize((width, round(img.height * width / img.width)), Image.LANCZOS)
+                img_buffer = BytesIO()
+                if is_photo:
+                    img.convert("RGB").save(img_buffer, format="JPEG", quality=JPEG_QUALITY, optimize=True)
+                    mime = "image/jpeg"
+                else:
+                    img.save(img_buffer, format="PNG", optimize=True)
+                    mime = "image/png"
+                return Asset(img_buffer.getvalue(), mime, img.width, img.height)
+        except FileNotFoundError:
+            return None
+
+
+# Process-wide registry, shared across reruns and sessions.
+asset_registry = AssetRegistry()
@@ -0,0 +1,617 @@
+import argparse
+import gc
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import tracemalloc
+import types
+from io import BytesIO
+
+# Keep benchmark data and mail away from the real stores and SMTP server (read at import time).
+# The directory and the stores in it are removed when main() returns.
+_BENCH_TEMP = tempfile.TemporaryDirectory(prefix="ehsqr-bench-", ignore_cleanup_errors=True)
+_BENCH_DIR = _BENCH_TEMP.name
+os.environ.setdefault("EHS_RESULTS_PATH", os.path.join(_BENCH_DIR, "results.sqlite3"))
+os.environ.setdefault("EHS_OUTBOX_PATH", os.path.join(_BENCH_DIR, "outbox.sqlite3"))
+os.environ.setdefault("EHS_PERMITS_PATH", os.path.join(_BENCH_DIR, "permits.sqlite3"))
+os.environ.setdefault("EHS_SMTP_HOST", "127.0.0.1")
+os.environ.setdefault("EHS_SMTP_PORT", "9")  # Discard port: deliveries fail fast and go to retry
+
+import qrcode  # noqa: E402
+
+from qr_codes import RENDERER_FAST, RENDERER_PIL, build_qr, generate_qr_code, render_qr_image  # noqa: E402
+
+APP_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "app.py")
+DATA_LENGTHS = [16, 64, 256, 1024, 2048]
+ERROR_LEVELS = {"L": qrcode.constants.ERROR_CORRECT_L, "H": qrcode.constants.ERROR_CORRECT_H}
+PAGES = [
+    "Bienvenue",
+    "Générateur de code QR",
+    "Induction de sécurité",
+    "Générateur de permis de travail",
+    "Vérification des codes QR",
+]
+SCAN_FRAME_SIZES = [(640, 480), (1280, 720), (1920, 1080)]
+REPORT_ROWS = 300_000
+
+
+def percentile(sorted_values, fraction):
+    """Returns the value at `fraction` (0-1) of an already sorted list."""
+    return sorted_values[min(len(sorted_values) - 1, int(fraction * len(sorted_values)))]
+
+
+def summarize(samples):
+    """Summarizes timing samples (seconds) in milliseconds."""
+    ordered = sorted(samples)
+    return {
+        "n": len(ordered),
+        "mean_ms": round(statistics.fmean(ordered) * 1000, 3),
+        "p50_ms": round(percentile(ordered, 0.50) * 1000, 3),
+        "p95_ms": round(percentile(ordered, 0.95) * 1000, 3),
+        "p99_ms": round(percentile(ordered, 0.99) * 1000, 3),
+        "max_ms": round(ordered[-1] * 1000, 3),
+    }
+
+
+def time_call(func, repeat):
+    """Runs `func` `repeat` times and returns the individual durations."""
+    samples = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        func()
+        samples.append(time.perf_counter() - started)
+    return samples
+
+
+def payload(length):
+    """Returns a URL-like payload of exactly `length` characters."""
+    base = "https://www.imerys.com/asset/"
+    return (base + "x" * length)[:length]
+
+
+# --- QR Generation ---
+def bench_qr_build(repeat):
+    """Times the QR matrix build (version fit and masking) across data lengths and error levels."""
+    results = []
+    for level_name, level in ERROR_LEVELS.items():
+        for length in DATA_LENGTHS:
+            text = payload(length)
+            try:
+                version = build_qr(text, error_correction=level).version
+            except ValueError:
+                continue  # Does not fit at this error correction level
+            samples = time_call(lambda: build_qr(text, error_correction=level), repeat)
+            results.append({"ec": level_name, "length": length, "version": version, **summarize(samples)})
+    return results
+
+
+def bench_rasterize(repeat):
+    """Times image rasterization of an already built matrix with both renderers."""
+    results = []
+    for length in DATA_LENGTHS:
+        qr = build_qr(payload(length))
+        matrix = qr.get_matrix()
+        pil_samples = time_call(lambda: qr.make_image(), repeat)
+        fast_samples = time_call(lambda: render_qr_image(matrix), repeat)
+        results.append(
+            {
+                "length": length,
+                "version": qr.version,
+                RENDERER_PIL: summarize(pil_samples),
+                RENDERER_FAST: summarize(fast_samples),
+            }
+        )
+    return results
+
+
+def bench_png_encode(repeat):
+    """Times PNG encoding of generated QR images and records the encoded size."""
+    results = []
+    for length in DATA_LENGTHS:
+        img = generate_qr_code(payload(length), renderer=RENDERER_FAST)
+        sizes = []
+
+        def encode():
+            img_buffer = BytesIO()
+            img.save(img_buffer, format="PNG")
+            sizes.append(img_buffer.tell())
+
+        samples = time_call(encode, repeat)
+        results.append({"length": length, "bytes": sizes[-1], "pixels": img.size[0], **summarize(samples)})
+    return results
+
+
+# --- Gate Scanning ---
+def bench_scan(repeat):
+    """Times decoding a camera frame and checking its code against the credential index."""
+    from PIL import Image
+
+    from results_store import InductionResult, badge_payload, get_results_store
+    from verification import CredentialIndex
+
+    result = InductionResult("Jean Dupont", "ACME", "jean@example.com", 10, 10)
+    get_results_store().add(result)
+    credential_index = CredentialIndex()
+    results = []
+    for width, height in SCAN_FRAME_SIZES:
+        # A badge held up to the camera: the code fills about a third of the frame height
+        box_size = max(1, height // 3 // 25)
+        qr_image = generate_qr_code(badge_payload(result.badge_id), box_size=box_size, renderer=RENDERER_FAST)
+        frame = Image.new("RGB", (width, height), (90, 110, 120))
+        frame.paste(qr_image, ((width - qr_image.width) // 2, (height - qr_image.height) // 2))
+        frame_buffer = BytesIO()
+        frame.save(frame_buffer, format="JPEG", quality=85)
+        frame_bytes = frame_buffer.getvalue()
+
+        outcomes = []
+        samples = time_call(lambda: outcomes.append(credential_index.scan(frame_bytes).status), repeat)
+        results.append({"frame": f"{width}x{height}", "status": outcomes[-1], **summarize(samples)})
+    return results
+
+
+# --- Compliance Reports ---
+def bench_reports(rows=REPORT_ROWS):
+    """Times each compliance report over `rows` synthetic results, with the memory it grew by."""
+    import random
+
+    import reports
+    from quiz import ANSWER_NOT_ASKED, ANSWER_SYMBOLS, bank_fingerprint
+    from results_store import InductionResult, ResultsStore
+    from sites import load_sites
+
+    sites, _ = load_sites()
+    site_ids = list(sites)
+    banks = {site_id: sites[site_id].content.quiz_questions for site_id in site_ids}
+    fingerprints = {site_id: bank_fingerprint(bank) for site_id, bank in banks.items()}
+    path = os.path.join(_BENCH_DIR, "reports.sqlite3")
+    store = ResultsStore(path)
+    rng = random.Random(0)
+    started_at = time.time() - 2 * 365 * 86400
+    batch = []
+    for index in range(rows):
+        site_id = rng.choice(site_ids)
+        answers = "".join(
+            ANSWER_SYMBOLS[rng.randrange(len(question["options"]))] if rng.random() < 0.8 else ANSWER_NOT_ASKED
+            for question in banks[site_id]
+        )
+        person = rng.randrange(rows)
+        batch.append(
+            InductionResult(
+                f"Personne {person}",
+                f"Entreprise {person % 500}",
+                f"personne{person}@example.com",
+                rng.randint(5, 10),
+                10,
+                completed_at=started_at + index * (2 * 365 * 86400 / rows),
+                site=site_id,
+                answers=answers,
+                bank_fingerprint=fingerprints[site_id],
+            )
+        )
+        if len(batch) == 10_000:
+            store.add_many(batch)
+            batch = []
+    store.add_many(batch)
+
+    results = []
+    for name, func in (
+        ("monthly", reports.monthly_pass_rates),
+        ("questions", reports.question_failure_rates),
+        ("contractors", reports.contractor_status),
+    ):
+        gc.collect()
+        rss_before = _rss_bytes()
+        started = time.perf_counter()
+        report = func(path)
+        elapsed = time.perf_counter() - started
+        results.append(
+            {
+                "report": name,
+                "rows": rows,
+                "report_rows": len(report),
+                "elapsed_s": round(elapsed, 3),
+                "rss_growth_bytes": _rss_bytes() - rss_before,
+            }
+        )
+    return results
+
+
+def _rss_bytes():
+    """Returns the resident set size of this process (Linux), or 0 where /proc is not available."""
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, IndexError, ValueError):
+        return 0
+
+
+# --- Page Reruns ---
+def _new_session():
+    from streamlit.testing.v1 import AppTest
+
+    return AppTest.from_file(APP_PATH, default_timeout=60)
+
+
+def _open_induction(at):
+    """Fills and submits the personal information form of the induction page."""
+    at.sidebar.radio[0].set_value("Induction de sécurité").run()
+    name, company, email = at.main.text_input
+    name.input("Jean Dupont")
+    company.input("ACME")
+    email.input("jean.dupont@example.com")
+    at.button[0].click().run()
+
+
+def _fill_quiz(at, option_index=0):
+    """Selects the same option for every quiz question; the form only sends them on submission."""
+    for radio in [radio for radio in at.main.radio if radio.key and radio.key.startswith("q")]:
+        radio.set_value(option_index)  # Quiz radios hold option indices
+
+
+def _button(at, label):
+    return next(button for button in at.button if button.label == label)
+
+
+def bench_page_reruns(repeat):
+    """Times a full script rerun per page, per induction section and per quiz submission."""
+    results = {}
+    at = _new_session().run()
+    for page in PAGES:
+        at.sidebar.radio[0].set_value(page).run()
+        results[page] = summarize(time_call(at.run, repeat))
+
+    at = _new_session().run()
+    _open_induction(at)
+    for section in at.main.radio[0].options:
+        at.main.radio[0].set_value(section).run()
+        results[f"Induction / {section}"] = summarize(time_call(at.run, repeat))
+
+    # Submitting the quiz: the rerun that scores and stores one attempt, then a new sample is drawn.
+    samples = []
+    for _ in range(repeat):
+        _fill_quiz(at)
+        submit = _button(at, "Valider mes réponses")
+        started = time.perf_counter()
+        submit.click().run()
+        samples.append(time.perf_counter() - started)
+        restart = [button for button in at.button if button.label == "Recommencer le quiz"]
+        if restart:
+            restart[0].click().run()
+        else:  # Passed: the next attempt needs a new session
+            at = _new_session().run()
+            _open_induction(at)
+            at.main.radio[0].set_value(at.main.radio[0].options[-1]).run()
+    results["Quiz / submit answers"] = summarize(samples)
+    return results
+
+
+# --- Cold Start ---
+COLD_START_PAGES = ["Bienvenue", "Générateur de code QR", "Induction de sécurité", "Vérification des codes QR"]
+
+
+def cold_start_child():
+    """Renders each page once in a fresh process and prints the app's start-up report as JSON."""
+    import warmup
+
+    at = _new_session().run()
+    if warmup.WARMUP_ENABLED:
+        warmup.start_warmup().join()  # The server would keep serving "Bienvenue" meanwhile
+    for page in COLD_START_PAGES[1:]:
+        at.sidebar.radio[0].set_value(page).run()
+    print(json.dumps(warmup.startup_report()))
+
+
+def bench_cold_start(repeat):
+    """Times the first render of each page in fresh processes, without and with the warm-up stage."""
+    results = {}
+    for warm in (False, True):
+        env = {**os.environ, "EHS_WARMUP": "1" if warm else "0"}
+        runs = []
+        for _ in range(max(1, repeat // 10)):  # Each run starts a new interpreter
+            output = subprocess.run(
+                [sys.executable, os.path.abspath(__file__), "--cold-start-child"],
+                env=env,
+                capture_output=True,
+                text=True,
+                check=True,
+            ).stdout
+            runs.append(json.loads(output.strip().splitlines()[-1]))
+        results["warmup" if warm else "no_warmup"] = {
+            "first_render_ms": {
+                page: round(statistics.median(run["first_render_ms"][page] for run in runs), 1)
+                for page in COLD_START_PAGES
+            },
+            "warmup": runs[-1]["warmup"],
+        }
+    return results
+
+
+# --- Email Path ---
+def bench_email_enqueue(repeat):
+    """Times enqueueing a result email, the only part of send_email the UI waits on."""
+    from mailer import DeliveryQueue, SMTPConfig
+
+    # Not started: only the synchronous part the UI waits on is measured.
+    delivery_queue = DeliveryQueue(SMTPConfig(), os.path.join(_BENCH_DIR, "bench_outbox.sqlite3"))
+    samples = time_call(lambda: delivery_queue.enqueue("bench@example.com", "Benchmark", "Score: 10/10"), repeat)
+    return summarize(samples)
+
+
+# --- Concurrent Sessions ---
+def bench_concurrent_sessions(sessions, reruns):
+    """Simulates concurrent visitors walking through the induction.
+
+    Each visitor runs in its own thread. AppTest cannot execute scripts in
+    parallel, so the reruns themselves are serialized, much as the GIL
+    serializes them in a real server. The reported latencies therefore include
+    the time a rerun waits behind other sessions. Also reports the Python heap
+    held per live session.
+    """
+    apps = [_new_session() for _ in range(sessions)]
+    latencies = []
+    errors = []
+    lock = threading.Lock()
+    script_lock = threading.Lock()
+
+    def visitor(at):
+        try:
+            with script_lock:
+                at.run()
+                _open_induction(at)
+                sections = at.main.radio[0].options
+            for index in range(reruns):
+                started = time.perf_counter()
+                with script_lock:
+                    at.main.radio[0].set_value(sections[index % len(sections)]).run()
+                with lock:
+                    latencies.append(time.perf_counter() - started)
+        except Exception as e:  # Reported in the results rather than aborting the whole run
+            with lock:
+                errors.append(repr(e))
+
+    started = time.perf_counter()
+    threads = [threading.Thread(target=visitor, args=(at,)) for at in apps]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - started
+
+    return {
+        "sessions": sessions,
+        "reruns_per_session": reruns,
+        "elapsed_s": round(elapsed, 3),
+        "reruns_per_s": round(len(latencies) / elapsed, 1) if elapsed else 0.0,
+        "latency": summarize(latencies) if latencies else None,
+        "bytes_per_session": measure_session_memory(sessions),
+        "errors": errors,
+    }
+
+
+def measure_session_memory(sessions):
+    """Returns the Python heap held per live session that has opened the induction.
+
+    Measured in a separate pass, since tracing allocations would distort the latencies.
+    """
+    gc.collect()
+    tracemalloc.start()
+    baseline, _ = tracemalloc.get_traced_memory()
+    apps = []
+    for _ in range(sessions):
+        at = _new_session().run()
+        _open_induction(at)
+        apps.append(at)
+    gc.collect()
+    current, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return (current - baseline) // sessions
+
+
+# --- Session Memory ---
+def _deep_sizeof(obj, shared_ids):
+    """Returns the bytes reachable from `obj`, not counting classes, functions or objects in `shared_ids`."""
+    seen = set(shared_ids)
+    stack = [obj]
+    total = 0
+    while stack:
+        item = stack.pop()
+        if id(item) in seen or isinstance(item, (type, types.ModuleType, types.FunctionType, types.BuiltinFunctionType)):
+            continue
+        seen.add(id(item))
+        total += sys.getsizeof(item)
+        if isinstance(item, dict):
+            stack.extend(item.keys())
+            stack.extend(item.values())
+        elif isinstance(item, (list, tuple, set, frozenset)):
+            stack.extend(item)
+        if hasattr(item, "__dict__"):
+            stack.append(vars(item))
+        for slot in getattr(type(item), "__slots__", ()):
+            if hasattr(item, slot):
+                stack.append(getattr(item, slot))
+    return total
+
+
+def _process_wide_ids():
+    """Returns the ids of the objects every session shares: site settings, content and quiz banks."""
+    from sites import load_sites
+
+    sites, _ = load_sites()
+    ids = set()
+    stack = [sites, *[site.content for site in sites.values()]]
+    while stack:
+        item = stack.pop()
+        if id(item) in ids:
+            continue
+        ids.add(id(item))
+        if isinstance(item, dict):
+            stack.extend(item.keys())
+            stack.extend(item.values())
+        elif isinstance(item, (list, tuple)):
+            stack.extend(item)
+        elif hasattr(item, "__dict__"):
+            stack.append(vars(item))
+    return ids
+
+
+def bench_session_memory(sessions):
+    """Returns the memory held per live session that has submitted the whole induction quiz.
+
+    `session_state_bytes` is what the session state keeps, widget metadata
+    included, minus the content shared by every session. `heap_bytes` is the
+    whole Python heap growth per session, which also counts AppTest's own copy
+    of the rendered page. `evicted_session_state_bytes` is what a session
+    still holds once the session registry has cleared it.
+    """
+    from sessions import SessionRegistry, clear_session_state
+
+    shared_ids = _process_wide_ids()
+    gc.collect()
+    tracemalloc.start()
+    baseline, _ = tracemalloc.get_traced_memory()
+    apps = []
+    for _ in range(sessions):
+        at = _new_session().run()
+        _open_induction(at)
+        at.main.radio[0].set_value(at.main.radio[0].options[-1]).run()  # The quiz is the last section
+        _fill_quiz(at)
+        _button(at, "Valider mes réponses").click().run()
+        apps.append(at)
+    gc.collect()
+    current, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    # AppTest keeps the app's SessionState behind its thread-safe wrapper
+    safe_states = [at.session_state._state for at in apps]
+    states = [safe_state._state for safe_state in safe_states]
+    state_bytes = sum(_deep_sizeof(state, shared_ids) for state in states)
+
+    # Every AppTest has the same session id, so eviction is measured on a registry of its own:
+    # with a cap of half the sessions, the least recently seen half is marked, then clears
+    # itself on its next visit.
+    registry = SessionRegistry(idle_seconds=float("inf"), max_sessions=max(1, sessions // 2))
+    for index in range(sessions):
+        registry.touch(f"bench-{index}", now=index)
+    evicted_states = []
+    for index, safe_state in enumerate(safe_states[: sessions - registry.stats()["sessions"]]):
+        if registry.touch(f"bench-{index}", now=sessions + index):
+            clear_session_state(safe_state)
+            evicted_states.append(safe_state._state)
+    evicted_bytes = sum(_deep_sizeof(state, shared_ids) for state in evicted_states)
+    return {
+        "sessions": sessions,
+        "session_state_bytes": state_bytes // sessions,
+        "heap_bytes": (current - baseline) // sessions,
+        "evicted_sessions": len(evicted_states),
+        "evicted_session_state_bytes": evicted_bytes // max(1, len(evicted_states)),
+    }
+
+
+# --- Comparison ---
+def compare(previous, current, threshold):
+    """Lists timings that got slower than `threshold` (ratio) between two result files."""
+    regressions = []
+
+    def walk(old, new, path):
+        if isinstance(old, dict) and isinstance(new, dict):
+            for key in old.keys() & new.keys():
+                walk(old[key], new[key], f"{path}/{key}")
+        elif isinstance(old, list) and isinstance(new, list):
+            for index, (old_item, new_item) in enumerate(zip(old, new)):
+                walk(old_item, new_item, f"{path}[{index}]")
+        elif path.endswith(("p50_ms", "p95_ms", "mean_ms")) and isinstance(old, (int, float)) and old > 0:
+            ratio = new / old
+            if ratio > threshold:
+                regressions.append({"metric": path, "before": old, "after": new, "ratio": round(ratio, 2)})
+
+    walk(previous["results"], current["results"], "")
+    return regressions
+
+
+def main():
+    """Runs the benchmark suite, then removes its temporary stores."""
+    try:
+        _main()
+    finally:
+        _BENCH_TEMP.cleanup()
+
+
+def _main():
+    """Runs the benchmark suite and writes the results as JSON."""
+    parser = argparse.ArgumentParser(
+        description="Benchmarks for QR generation, gate scanning, reports, page reruns and the email path."
+    )
+    parser.add_argument("--output", default="bench_results.json")
+    parser.add_argument("--compare", help="Previous results file to check for regressions.")
+    parser.add_argument("--threshold", type=float, default=1.2, help="Slowdown ratio reported as a regression.")
+    parser.add_argument("--repeat", type=int, default=20)
+    parser.add_argument("--sessions", type=int, default=10)
+    parser.add_argument("--reruns", type=int, default=10)
+    parser.add_argument("--report-rows", type=int, default=REPORT_ROWS)
+    parser.add_argument(
+        "--only",
+        nargs="+",
+        choices=[
+            "qr_build",
+            "rasterize",
+            "png_encode",
+            "scan",
+            "reports",
+            "page_reruns",
+            "cold_start",
+            "email_enqueue",
+            "concurrent_sessions",
+            "session_memory",
+        ],
+    )
+    parser.add_argument("--cold-start-child", action="store_true", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    if args.cold_start_child:
+        cold_start_child()
+        return
+
+    benchmarks = {
+        "qr_build": lambda: bench_qr_build(args.repeat),
+        "rasterize": lambda: bench_rasterize(args.repeat),
+        "png_encode": lambda: bench_png_encode(args.repeat),
+        "scan": lambda: bench_scan(args.repeat),
+        "reports": lambda: bench_reports(args.report_rows),
+        "page_reruns": lambda: bench_page_reruns(args.repeat),
+        "cold_start": lambda: bench_cold_start(args.repeat),
+        "email_enqueue": lambda: bench_email_enqueue(args.repeat),
+        "concurrent_sessions": lambda: bench_concurrent_sessions(args.sessions, args.reruns),
+        "session_memory": lambda: bench_session_memory(args.sessions),
+    }
+    results = {}
+    for name, bench in benchmarks.items():
+        if args.only and name not in args.only:
+            continue
+        print(f"Running {name}...", file=sys.stderr)
+        results[name] = bench()
+
+    report = {
+        "created_at": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "python": platform.python_version(),
+        "machine": platform.machine(),
+        "cpu_count": os.cpu_count(),
+        "results": results,
+    }
+    with open(args.output, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2, ensure_ascii=False)
+    print(f"Results written to {args.output}", file=sys.stderr)
+
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as f:
+            regressions = compare(json.load(f), report, args.threshold)
+        print(json.dumps({"regressions": regressions}, indent=2, ensure_ascii=False))
+        if regressions:
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,109 @@
+import functools
+import json
+import os
+from dataclasses import dataclass, field
+
+# --- Content Settings ---
+CONTENT_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "content")
+DEFAULT_SITE = "lixhe"
+DEFAULT_LANGUAGE = "fr"
+
+
+@dataclass
+class SectionImage:
+    """An illustration shown below a section."""
+
+    path: str
+    caption: str
+    missing_message: str
+
+
+@dataclass
+class CompiledSection:
+    """An induction section pre-rendered to a single markdown block."""
+
+    title: str
+    position: int  # 1-based place in the induction, drives the progress bar
+    markdown: str
+    image: SectionImage = None
+    subsection_prompt: str = None
+    subsection_placeholder: str = None  # Selector entry that shows no subsection
+    subsections: dict = field(default_factory=dict)  # title -> markdown, in display order
+
+
+@dataclass
+class InductionContent:
+    """Compiled induction sections and quiz for one site and language."""
+
+    site: str
+    language: str
+    section_prompt: str
+    sections: dict  # title -> CompiledSection, in display order
+    quiz_title: str
+    quiz_intro: str
+    quiz_questions: list
+    quiz_sample_size: int = None  # Questions drawn at random per visitor, all of them when None
+
+    @property
+    def section_titles(self):
+        """Returns the titles offered in the section selector, quiz last."""
+        return list(self.sections) + [self.quiz_title]
+
+    @property
+    def total_steps(self):
+        """Returns the number of induction sections plus the quiz."""
+        return len(self.sections) + 1
+
+
+def compile_blocks(heading, body):
+    """Compiles a heading and its body blocks into one markdown string.
+
+    A body block is a paragraph (string), a bullet list (list of strings) or a
+    sub-heading ({"subheader": text}).
+    """
+    parts = [f"### {heading}"] if heading else []
+    for block in body:
+        if isinstance(block, list):
+            parts.append("\n".join(f"- {item}" for item in block))
+        elif isinstance(block, dict):
+            parts.append(f"### {block['subheader']}")
+        else:
+            parts.append(block)
+    return "\n\n".join(parts)
+
+
+def compile_content(raw):
+    """Compiles parsed content data into an InductionContent."""
+    sections = {}
+    for position, section in enumerate(raw["sections"], start=1):
+        image = section.get("image")
+        sections[section["title"]] = CompiledSection(
+            title=section["title"],
+            position=position,
+            markdown=compile_blocks(section.get("heading"), section.get("body", [])),
+            image=SectionImage(**image) if image else None,
+            subsection_prompt=section.get("subsection_prompt"),
+            subsection_placeholder=section.get("subsection_placeholder"),
+            subsections={
+                subsection["title"]: compile_blocks(subsection.get("heading"), subsection.get("body", []))
+                for subsection in section.get("subsections", [])
+            },
+        )
+    quiz = raw["quiz"]
+    return InductionContent(
+        site=raw["site"],
+        language=raw["language"],
+        section_prompt=raw["section_prompt"],
+        sections=sections,
+        quiz_title=quiz["title"],
+        quiz_intro=quiz["intro"],
+        quiz_questions=quiz["questions"],
+        quiz_sample_size=quiz.get("sample_size"),
+    )
+
+
+@functools.lru_cache(maxsize=None)
+def load_content(site=DEFAULT_SITE, language=DEFAULT_LANGUAGE):
+    """Loads and compiles the induction content of a site, once per process."""
+    with open(os.path.join(CONTENT_DIR, f"{site}.{language}.json"), encoding="utf-8") as f:
+        return compile_content(json.load(f))
@@ -0,0 +1,311 @@
+import os
+import queue
+import smtplib
+import sqlite3
+import ssl
+import threading
+import time
+from dataclasses import dataclass, field
+from email.mime.text import MIMEText
+
+from metrics import count, span
+
+# --- Delivery Settings ---
+OUTBOX_PATH = os.environ.get("EHS_OUTBOX_PATH", "outbox.sqlite3")
+DELIVERY_WORKERS = 2  # Background threads sending from the outbox
+MAX_ATTEMPTS = 6  # A message is marked as failed after this many attempts
+RETRY_BASE_DELAY = 5.0  # Seconds before the first retry, doubled on every attempt
+RETRY_MAX_DELAY = 15 * 60.0
+CONNECTION_IDLE_CHECK = 30.0  # Idle pooled connections older than this are checked with NOOP before reuse
+SENT_RETENTION_DAYS = 30  # Delivered messages (bodies already blanked) are deleted after this many days
+LOCAL_HOSTS = {"localhost", "127.0.0.1", "::1"}  # Plain SMTP without STARTTLS is only allowed to these
+
+STATUS_PENDING = "pending"
+STATUS_SENDING = "sending"
+STATUS_SENT = "sent"
+STATUS_FAILED = "failed"
+
+
+@dataclass
+class SMTPConfig:
+    """Connection settings for the outgoing mail server."""
+
+    host: str = field(default_factory=lambda: os.environ.get("EHS_SMTP_HOST", "smtp.gmail.com"))
+    port: int = field(default_factory=lambda: int(os.environ.get("EHS_SMTP_PORT", "465")))
+    use_ssl: bool = field(default_factory=lambda: os.environ.get("EHS_SMTP_SSL", "1") == "1")
+    sender_email: str = field(default_factory=lambda: os.environ.get("EHS_SENDER_EMAIL", "your_sender_email@example.com"))
+    sender_password: str = field(default_factory=lambda: os.environ.get("EHS_SENDER_PASSWORD", "your_sender_password"))
+    pool_size: int = 2
+    timeout: float = 30.0
+
+
+class SMTPConnectionPool:
+    """Pool of reusable, authenticated SMTP connections.
+
+    Connections are opened lazily, handed to one delivery thread at a time and
+    kept open between messages, so the TLS handshake and login are only paid
+    once per connection.
+    """
+
+    def __init__(self, config):
+        self.config = config
+        self._idle = queue.LifoQueue()
+        self._slots = threading.BoundedSemaphore(config.pool_size)
+
+    def _connect(self):
+        """Opens and authenticates a new connection."""
+        config = self.config
+        smtp_class = smtplib.SMTP_SSL if config.use_ssl else smtplib.SMTP
+        server = smtp_class(config.host, config.port, timeout=config.timeout)
+        try:
+            if not config.use_ssl and config.host not in LOCAL_HOSTS:
+                # Upgrade before logging in, so the password never crosses the network in clear text
+                server.starttls(context=ssl.create_default_context())
+            if config.sender_password:
+                server.login(config.sender_email, config.sender_password)
+        except BaseException:
+            self._close(server)
+            raise
+        return server
+
+    def acquire(self):
+        """Returns a ready connection, reusing an idle one when it is still alive."""
+        self._slots.acquire()
+        try:
+            while True:
+                try:
+                    server, idle_since = self._idle.get_nowait()
+                except queue.Empty:
+                    return self._connect()
+                if time.monotonic() - idle_since < CONNECTION_IDLE_CHECK:
+                    return server
+                try:
+                    if server.noop()[0] == 250:
+                        return server
+                except (smtplib.SMTPException, OSError):
+                    pass
+                self._close(server)
+        except BaseException:
+            self._slots.release()
+            raise
+
+    def release(self, server):
+        """Returns a healthy connection to the pool."""
+        self._idle.put((server, time.monotonic()))
+        self._slots.release()
+
+    def discard(self, server):
+        """Closes a connection that failed and frees its slot."""
+        self._close(server)
+        self._slots.release()
+
+    def close(self):
+        """Closes all idle connections."""
+        while True:
+            try:
+                server, _ = self._idle.get_nowait()
+            except queue.Empty:
+                return
+            self._close(server)
+
+    @staticmethod
+    def _close(server):
+        try:
+            server.quit()
+        except (smtplib.SMTPException, OSError):
+            server.close()
+
+
+class Outbox:
+    """Persistent SQLite store of messages waiting to be delivered."""
+
+    def __init__(self, path=OUTBOX_PATH):
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._lock = threading.Lock()
+        with self._lock:
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute(
+                """
+                CREATE TABLE IF NOT EXISTS outbox (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    sender TEXT NOT NULL,
+                    recipient TEXT NOT NULL,
+                    message TEXT NOT NULL,
+                    status TEXT NOT NULL,
+                    attempts INTEGER NOT NULL DEFAULT 0,
+                    next_attempt_at REAL NOT NULL,
+                    last_error TEXT,
+                    created_at REAL NOT NULL
+                )
+                """
+            )
+            self._conn.execute("CREATE INDEX IF NOT EXISTS outbox_due ON outbox (status, next_attempt_at)")
+            # Messages that were being sent when the process stopped are retried.
+            self._conn.execute("UPDATE outbox SET status = ? WHERE status = ?", (STATUS_PENDING, STATUS_SENDING))
+            self._conn.execute(
+                "UPDATE outbox SET message = '' WHERE status = ? AND message != ''", (STATUS_FAILED,)
+            )  # Failed before failed messages were blanked
+            self._conn.execute(
+                "DELETE FROM outbox WHERE status = ? AND created_at < ?",
+                (STATUS_SENT, time.time() - SENT_RETENTION_DAYS * 86400),
+            )
+
+    def add(self, sender, recipient, message):
+        """Stores a new message and returns its id."""
+        now = time.time()
+        with self._lock:
+            cursor = self._conn.execute(
+                "INSERT INTO outbox (sender, recipient, message, status, next_attempt_at, created_at) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                (sender, recipient, message, STATUS_PENDING, now, now),
+            )
+            return cursor.lastrowid
+
+    def claim_due(self):
+        """Marks the oldest due message as being sent and returns it, or None if nothing is due."""
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT id, sender, recipient, message, attempts FROM outbox "
+                "WHERE status = ? AND next_attempt_at <= ? ORDER BY next_attempt_at LIMIT 1",
+                (STATUS_PENDING, time.time()),
+            ).fetchone()
+            if row is not None:
+                self._conn.execute("UPDATE outbox SET status = ? WHERE id = ?", (STATUS_SENDING, row[0]))
+            return row
+
+    def next_due_in(self):
+        """Returns the number of seconds until the next pending message is due, or None if there is none."""
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT MIN(next_attempt_at) FROM outbox WHERE status = ?", (STATUS_PENDING,)
+            ).fetchone()
+        return None if row[0] is None else max(0.0, row[0] - time.time())
+
+    def mark_sent(self, message_id):
+        """Records a successful delivery and blanks the message, which holds the visitor's results."""
+        with self._lock:
+            self._conn.execute(
+                "UPDATE outbox SET status = ?, attempts = attempts + 1, last_error = NULL, message = '' WHERE id = ?",
+                (STATUS_SENT, message_id),
+            )
+
+    def mark_failed(self, message_id, attempts, error, permanent=False):
+        """Records a failed attempt and schedules a retry with exponential backoff, unless it is `permanent`.
+
+        A message that will not be retried is blanked, as a sent one is.
+        """
+        given_up = permanent or attempts >= MAX_ATTEMPTS
+        if given_up:
+            status, next_attempt_at = STATUS_FAILED, time.time()
+        else:
+            status = STATUS_PENDING
+            next_attempt_at = time.time() + min(RETRY_MAX_DELAY, RETRY_BASE_DELAY * 2 ** (attempts - 1))
+        with self._lock:
+            self._conn.execute(
+                "UPDATE outbox SET status = ?, attempts = ?, next_attempt_at = ?, last_error = ?, "
+                "message = CASE WHEN ? THEN '' ELSE message END WHERE id = ?",
+                (status, attempts, next_attempt_at, error, given_up, message_id),
+            )
+
+    def status(self, message_id):
+        """Returns (status, attempts, last_error) for a message."""
+        with self._lock:
+            return self._conn.execute(
+                "SELECT status, attempts, last_error FROM outbox WHERE id = ?", (message_id,)
+            ).fetchone()
+
+    def counts(self):
+        """Returns the number of messages per status."""
+        with self._lock:
+            return dict(self._conn.execute("SELECT status, COUNT(*) FROM outbox GROUP BY status").fetchall())
+
+
+class DeliveryQueue:
+    """Background delivery of outbox messages through a pooled SMTP connection."""
+
+    def __init__(self, config=None, outbox_path=OUTBOX_PATH, workers=DELIVERY_WORKERS):
+        self.config = config or SMTPConfig()
+        self.outbox = Outbox(outbox_path)
+        self.pool = SMTPConnectionPool(self.config)
+        self._wakeup = threading.Event()
+        self._stopping = threading.Event()
+        self._threads = [
+            threading.Thread(target=self._run, name=f"ehs-mail-{index}", daemon=True) for index in range(workers)
+        ]
+
+    def start(self):
+        """Starts the delivery threads."""
+        for thread in self._threads:
+            thread.start()
+        return self
+
+    def stop(self, timeout=5.0):
+        """Stops the delivery threads and closes pooled connections."""
+        self._stopping.set()
+        self._wakeup.set()
+        for thread in self._threads:
+            thread.join(timeout)
+        self.pool.close()
+
+    def enqueue(self, recipient, subject, body):
+        """Stores a plain-text message in the outbox and returns its id without waiting for delivery."""
+        msg = MIMEText(body)
+        msg["Subject"] = subject
+        msg["From"] = self.config.sender_email
+        msg["To"] = recipient
+        message_id = self.outbox.add(self.config.sender_email, recipient, msg.as_string())
+        count("email_enqueued")
+        self._wakeup.set()
+        return message_id
+
+    def _run(self):
+        while not self._stopping.is_set():
+            row = self.outbox.claim_due()
+            if row is None:
+                self._wakeup.clear()
+                delay = self.outbox.next_due_in()
+                self._wakeup.wait(RETRY_MAX_DELAY if delay is None else delay)
+                continue
+            self._deliver(*row)
+
+    def _deliver(self, message_id, sender, recipient, message, attempts):
+        try:
+            server = self.pool.acquire()
+        except (smtplib.SMTPException, OSError) as e:
+            self.outbox.mark_failed(message_id, attempts + 1, str(e))
+            count("email_send_failed")
+            return
+        try:
+            with span("smtp_send"):
+                server.sendmail(sender, recipient, message)
+        except (smtplib.SMTPException, OSError) as e:
+            if isinstance(e, (smtplib.SMTPResponseException, smtplib.SMTPRecipientsRefused)):
+                self.pool.release(server)  # The server answered; sendmail() has reset the transaction
+            else:  # Disconnected, timed out or a socket error (SMTPException is itself an OSError)
+                self.pool.discard(server)
+            self.outbox.mark_failed(message_id, attempts + 1, str(e), permanent=_is_permanent(e))
+            count("email_send_failed")
+        else:
+            self.pool.release(server)
+            self.outbox.mark_sent(message_id)
+            count("email_sent")
+
+
+def _is_permanent(error):
+    """Returns whether the server rejected the message for good (5xx), e.g. a mistyped recipient address."""
+    if isinstance(error, smtplib.SMTPRecipientsRefused):
+        return bool(error.recipients) and all(code >= 500 for code, _ in error.recipients.values())
+    return isinstance(error, smtplib.SMTPResponseException) and error.smtp_code >= 500
+
+
+_delivery_queue = None
+_delivery_queue_lock = threading.Lock()
+
+
+def get_delivery_queue():
+    """Returns the process-wide delivery queue, starting it on first use."""
+    global _delivery_queue
+    with _delivery_queue_lock:
+        if _delivery_queue is None:
+            _delivery_queue = DeliveryQueue().start()
+        return _delivery_queue
@@ -0,0 +1,236 @@
+import bisect
+import contextlib
+import functools
+import importlib.util
+import io
+import os
+import threading
+import time
+
+# --- Instrumentation Settings ---
+# Off by default: spans and counters then cost one global check and nothing is recorded.
+METRICS_ENABLED = os.environ.get("EHS_METRICS", "") == "1"
+METRICS_PORT = int(os.environ.get("EHS_METRICS_PORT", "0"))  # Serves /metrics on this port when set
+METRIC_PREFIX = "ehs"
+# Histogram bucket upper bounds, in seconds.
+SPAN_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0)
+
+# --- Profilers ---
+PROFILER_CPROFILE = "cProfile"
+PROFILER_PYINSTRUMENT = "pyinstrument"
+PROFILE_REPORT_LINES = 40  # Functions listed in a cProfile report
+
+_enabled = METRICS_ENABLED
+_NOOP_SPAN = contextlib.nullcontext()
+
+
+class _SpanStats:
+    """Duration histogram of one span name."""
+
+    __slots__ = ("count", "total", "max", "buckets")
+
+    def __init__(self):
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+        self.buckets = [0] * (len(SPAN_BUCKETS) + 1)  # The last bucket is +Inf
+
+
+class MetricsRegistry:
+    """Process-wide timings and counters, shared by every session."""
+
+    def __init__(self):
+        self._spans = {}
+        self._counters = {}
+        self._started_at = time.time()
+        self._lock = threading.Lock()
+
+    def observe(self, name, seconds):
+        """Records one duration for span `name`."""
+        bucket = bisect.bisect_left(SPAN_BUCKETS, seconds)
+        with self._lock:
+            stats = self._spans.get(name)
+            if stats is None:
+                stats = self._spans[name] = _SpanStats()
+            stats.count += 1
+            stats.total += seconds
+            stats.max = max(stats.max, seconds)
+            stats.buckets[bucket] += 1
+
+    def increment(self, name, amount=1):
+        """Adds `amount` to counter `name`."""
+        with self._lock:
+            self._counters[name] = self._counters.get(name, 0) + amount
+
+    def snapshot(self):
+        """Returns ({span: {count, total_s, mean_ms, max_ms}}, {counter: value})."""
+        with self._lock:
+            spans = {
+                name: {
+                    "count": stats.count,
+                    "total_s": stats.total,
+                    "mean_ms": stats.total / stats.count * 1000 if stats.count else 0.0,
+                    "max_ms": stats.max * 1000,
+                }
+                for name, stats in sorted(self._spans.items())
+            }
+            return spans, dict(sorted(self._counters.items()))
+
+    def render_prometheus(self):
+        """Returns every metric in the Prometheus text exposition format."""
+        lines = [
+            f"# HELP {METRIC_PREFIX}_span_seconds Duration of instrumented operations.",
+            f"# TYPE {METRIC_PREFIX}_span_seconds histogram",
+        ]
+        with self._lock:
+            for name, stats in sorted(self._spans.items()):
+                cumulative = 0
+                for bound, bucket_count in zip((*SPAN_BUCKETS, "+Inf"), stats.buckets):
+                    cumulative += bucket_count
+                    lines.append(f'{METRIC_PREFIX}_span_seconds_bucket{{span="{name}",le="{bound}"}} {cumulative}')
+                lines.append(f'{METRIC_PREFIX}_span_seconds_sum{{span="{name}"}} {stats.total:.6f}')
+                lines.append(f'{METRIC_PREFIX}_span_seconds_count{{span="{name}"}} {stats.count}')
+            lines.append(f"# HELP {METRIC_PREFIX}_events_total Counted events (cache hits, emails, ...).")
+            lines.append(f"# TYPE {METRIC_PREFIX}_events_total counter")
+            for name, value in sorted(self._counters.items()):
+                lines.append(f'{METRIC_PREFIX}_events_total{{event="{name}"}} {value}')
+        lines.append(f"# TYPE {METRIC_PREFIX}_process_start_time_seconds gauge")
+        lines.append(f"{METRIC_PREFIX}_process_start_time_seconds {self._started_at:.3f}")
+        return "\n".join(lines) + "\n"
+
+    def reset(self):
+        """Forgets every recorded timing and counter."""
+        with self._lock:
+            self._spans.clear()
+            self._counters.clear()
+
+
+# Process-wide registry, shared across reruns and sessions.
+metrics = MetricsRegistry()
+
+
+class _Span:
+    __slots__ = ("name", "started")
+
+    def __init__(self, name):
+        self.name = name
+
+    def __enter__(self):
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info):
+        metrics.observe(self.name, time.perf_counter() - self.started)
+
+
+def is_enabled():
+    """Returns whether spans and counters are being recorded."""
+    return _enabled
+
+
+def set_enabled(enabled):
+    """Turns recording on or off for the whole process."""
+    global _enabled
+    _enabled = bool(enabled)
+
+
+def span(name):
+    """Context manager timing the enclosed block as span `name` (a shared no-op when disabled)."""
+    if not _enabled:
+        return _NOOP_SPAN
+    return _Span(name)
+
+
+def timed(name):
+    """Decorator timing every call of the function as span `name`."""
+
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            if not _enabled:
+                return func(*args, **kwargs)
+            with _Span(name):
+                return func(*args, **kwargs)
+
+        return wrapper
+
+    return decorator
+
+
+def count(name, amount=1):
+    """Adds `amount` to counter `name` when instrumentation is enabled."""
+    if _enabled:
+        metrics.increment(name, amount)
+
+
+def available_profilers():
+    """Returns the profiler engines installed in this environment."""
+    # pyinstrument is optional; cProfile is always available
+    return [PROFILER_CPROFILE] + ([PROFILER_PYINSTRUMENT] if importlib.util.find_spec("pyinstrument") else [])
+
+
+class Profile:
+    """Context manager profiling the enclosed block; the text report is in `report` afterwards."""
+
+    def __init__(self, engine=PROFILER_CPROFILE):
+        self.engine = engine if engine in available_profilers() else PROFILER_CPROFILE
+        self.report = None
+        self._profiler = None
+
+    def __enter__(self):
+        if self.engine == PROFILER_PYINSTRUMENT:
+            from pyinstrument import Profiler
+
+            self._profiler = Profiler()
+            self._profiler.start()
+        else:
+            import cProfile
+
+            self._profiler = cProfile.Profile()
+            self._profiler.enable()
+        return self
+
+    def __exit__(self, *exc_info):
+        if self.engine == PROFILER_CPROFILE:
+            import pstats
+
+            self._profiler.disable()
+            report = io.StringIO()
+            stats = pstats.Stats(self._profiler, stream=report)
+            stats.sort_stats(pstats.SortKey.CUMULATIVE).print_stats(PROFILE_REPORT_LINES)
+            self.report = report.getvalue()
+        else:
+            self._profiler.stop()
+            self.report = self._profiler.output_text()
+
+
+_metrics_server = None
+_metrics_server_lock = threading.Lock()
+
+
+def start_metrics_server(port=METRICS_PORT, host="0.0.0.0"):
+    """Serves GET /metrics from a background thread, once per process. Does nothing without a port."""
+    global _metrics_server
+    with _metrics_server_lock:
+        if _metrics_server is None and port:
+            from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+            class _MetricsHandler(BaseHTTPRequestHandler):
+                def do_GET(self):
+                    if self.path.split("?")[0] != "/metrics":
+                        self.send_error(404)
+                        return
+                    body = metrics.render_prometheus().encode("utf-8")
+                    self.send_response(200)
+                    self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+                    self.send_header("Content-Length", str(len(body)))
+                    self.end_headers()
+                    self.wfile.write(body)
+
+                def log_message(self, format, *args):
+                    pass  # Scrapes every few seconds would flood the Streamlit log
+
+            _metrics_server = ThreadingHTTPServer((host, port), _MetricsHandler)
+            _metrics_server.daemon_threads = True
+            threading.Thread(target=_metrics_server.serve_forever, name="ehs-metrics", daemon=True).start()
+        return _metrics_server
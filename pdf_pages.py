@@ -0,0 +1,129 @@
+import functools
+import os
+import zlib
+
+from PIL import ImageFont
+
+# --- Page Layout (A4 at 150 dpi) ---
+PAGE_WIDTH_PX = 1240
+PAGE_HEIGHT_PX = 1754
+PAGE_WIDTH_PT = 595.28
+PAGE_HEIGHT_PT = 841.89
+
+# --- Fonts ---
+# Pillow's built-in font has no accented glyphs; DejaVu comes from packages.txt (fonts-dejavu-core).
+FONT_PATH = os.environ.get("EHS_FONT_PATH", "DejaVuSans.ttf")
+BOLD_FONT_PATH = os.environ.get("EHS_BOLD_FONT_PATH", "DejaVuSans-Bold.ttf")
+
+# --- PDF Output ---
+# 1-bit pages are mostly long runs of white: level 1 deflates them 2.5x faster than level 6
+# for pages about a quarter larger.
+PDF_COMPRESSION_LEVEL = 1
+
+
+@functools.lru_cache(maxsize=None)
+def load_font(size, bold=False):
+    """Returns a TrueType font of `size` pixels, falling back to Pillow's built-in font."""
+    for path in (BOLD_FONT_PATH, FONT_PATH) if bold else (FONT_PATH,):
+        try:
+            return ImageFont.truetype(path, size)
+        except OSError:
+            continue
+    return ImageFont.load_default(size=size)
+
+
+def wrap_text(text, font, width, max_lines):
+    """Splits `text` into at most `max_lines` lines that fit in `width` pixels.
+
+    Each word is measured once and line widths are summed, instead of
+    re-measuring the growing line after every word.
+    """
+    space = font.getlength(" ")
+    lines, current, current_width = [], [], 0.0
+    for word in text.split():
+        word_width = font.getlength(word)
+        if current and current_width + space + word_width > width:
+            lines.append(" ".join(current))
+            if len(lines) == max_lines:
+                return lines  # The rest would not be printed, so it is not measured either
+            current, current_width = [], 0.0
+        current_width += (space if current else 0.0) + word_width
+        current.append(word)
+    if current:
+        lines.append(" ".join(current))
+    return lines
+
+
+def fit_text(text, font, width):
+    """Shortens `text` with an ellipsis until it fits in `width` pixels."""
+    text_width = font.getlength(text)
+    if text_width <= width:
+        return text
+    text = text[: int(len(text) * width / text_width) + 1]  # Close to the cut, then a few characters at a time
+    while text and font.getlength(text + "…") > width:
+        text = text[:-1]
+    return text.rstrip() + "…"
+
+
+class StreamingPdfWriter:
+    """Minimal PDF writer that emits one full-page 1-bit image per page as soon as it is added."""
+
+    def __init__(self, fileobj):
+        self.fileobj = fileobj
+        self.offsets = {}
+        self.page_ids = []
+        self.next_id = 3  # 1 is the catalog, 2 the page tree (written last)
+        self._position = 0
+        self._write(b"%PDF-1.4\n%\xe2\xe3\xcf\xd3\n")
+
+    def _write(self, data):
+        self.fileobj.write(data)
+        self._position += len(data)
+
+    def _write_object(self, object_id, body, stream=None):
+        self.offsets[object_id] = self._position
+        self._write(f"{object_id} 0 obj\n".encode("ascii") + body)
+        if stream is not None:
+            self._write(b"\nstream\n" + stream + b"\nendstream")
+        self._write(b"\nendobj\n")
+
+    def add_page(self, page_image):
+        """Writes a mode "1" page image as a new page."""
+        image_id, content_id, page_id = self.next_id, self.next_id + 1, self.next_id + 2
+        self.next_id += 3
+
+        image_data = zlib.compress(page_image.tobytes(), PDF_COMPRESSION_LEVEL)
+        width, height = page_image.size
+        self._write_object(
+            image_id,
+            (
+                f"<< /Type /XObject /Subtype /Image /Width {width} /Height {height} "
+                f"/ColorSpace /DeviceGray /BitsPerComponent 1 /Filter /FlateDecode "
+                f"/Length {len(image_data)} >>"
+            ).encode("ascii"),
+            image_data,
+        )
+        content = f"q {PAGE_WIDTH_PT} 0 0 {PAGE_HEIGHT_PT} 0 0 cm /Im0 Do Q".encode("ascii")
+        self._write_object(content_id, f"<< /Length {len(content)} >>".encode("ascii"), content)
+        self._write_object(
+            page_id,
+            (
+                f"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 {PAGE_WIDTH_PT} {PAGE_HEIGHT_PT}] "
+                f"/Resources << /XObject << /Im0 {image_id} 0 R >> >> /Contents {content_id} 0 R >>"
+            ).encode("ascii"),
+        )
+        self.page_ids.append(page_id)
+
+    def close(self):
+        """Writes the catalog, page tree and cross-reference table."""
+        self._write_object(1, b"<< /Type /Catalog /Pages 2 0 R >>")
+        kids = " ".join(f"{page_id} 0 R" for page_id in self.page_ids)
+        self._write_object(2, f"<< /Type /Pages /Kids [{kids}] /Count {len(self.page_ids)} >>".encode("ascii"))
+
+        xref_position = self._position
+        object_count = self.next_id
+        lines = [f"xref\n0 {object_count}\n", "0000000000 65535 f \n"]
+        for object_id in range(1, object_count):
+            lines.append(f"{self.offsets[object_id]:010d} 00000 n \n")
+        lines.append(f"trailer\n<< /Size {object_count} /Root 1 0 R >>\nstartxref\n{xref_position}\n%%EOF\n")
+        self._write("".join(lines).encode("ascii"))
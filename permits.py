@@ -0,0 +1,321 @@
+import csv
+import functools
+import io
+import json
+import os
+import secrets
+import sqlite3
+import threading
+import time
+from dataclasses import dataclass, field
+from io import BytesIO
+
+from PIL import Image, ImageDraw
+
+from content import CONTENT_DIR
+from pdf_pages import PAGE_HEIGHT_PX, PAGE_WIDTH_PX, StreamingPdfWriter, load_font, wrap_text
+from qr_codes import DEFAULT_BORDER, RENDERER_FAST, generate_qr_code
+
+# --- Batch Input ---
+CSV_DELIMITERS = ",;\t"  # Delimiters recognized in uploaded CSV files
+
+# --- Permit Settings ---
+PERMIT_TEMPLATES_PATH = os.path.join(CONTENT_DIR, "permits.json")
+PERMITS_PATH = os.environ.get("EHS_PERMITS_PATH", "permits.sqlite3")
+PERMIT_QR_PREFIX = "EHS-PERMIT:"  # QR payload is the prefix followed by the verification ID
+PERMIT_ID_BYTES = 16  # Random part of a verification ID, as unguessable as a badge ID
+
+# --- Permit Layout (pixels on the A4 page) ---
+MARGIN = 80
+QR_SIDE = 280
+TITLE_SIZE = 48
+SUBTITLE_SIZE = 26
+LABEL_SIZE = 22
+VALUE_SIZE = 28
+FIELD_LINE_HEIGHT = 44
+FIELD_SPACING = 18
+CHECKBOX_SIZE = 26
+SIGNATURE_HEIGHT = 150
+
+
+@dataclass
+class FieldBox:
+    """Where a template field's value is written on the page."""
+
+    name: str
+    label: str
+    left: int
+    top: int
+    width: int
+    lines: int
+
+
+@dataclass
+class CompiledTemplate:
+    """A permit template laid out once: static page image plus the boxes to fill."""
+
+    id: str
+    title: str
+    fields: list  # FieldBox, in form order
+    base_page: Image.Image
+    qr_box: tuple  # (left, top, side)
+    id_position: tuple  # Where the verification ID is printed under the QR code
+    id_size: int  # Font size at which any verification ID fits beside the QR code
+
+
+@dataclass
+class Permit:
+    """An issued work permit."""
+
+    permit_id: str
+    template_id: str
+    values: dict
+    site: str
+    issued_at: float = field(default_factory=time.time)
+    valid_until: float = None
+
+    @property
+    def qr_payload(self):
+        return f"{PERMIT_QR_PREFIX}{self.permit_id}"
+
+
+def new_permit_id(issued_at=None):
+    """Returns a new verification ID such as PT-20260118-3F9A61C2D07E4B19A5C3E8F0162B7D4A."""
+    day = time.strftime("%Y%m%d", time.localtime(issued_at))
+    return f"PT-{day}-{secrets.token_hex(PERMIT_ID_BYTES).upper()}"
+
+
+@functools.lru_cache(maxsize=None)
+def load_permit_settings():
+    """Loads the permit template definitions once per process."""
+    with open(PERMIT_TEMPLATES_PATH, encoding="utf-8") as f:
+        return json.load(f)
+
+
+@functools.lru_cache(maxsize=None)
+def compile_template(template_id, site_name):
+    """Lays out a permit template and renders its static parts, once per process and site.
+
+    Filling a permit then only copies the base page and draws the values and
+    the QR code.
+    """
+    template = load_permit_settings()["templates"][template_id]
+    page = Image.new("1", (PAGE_WIDTH_PX, PAGE_HEIGHT_PX), 1)
+    draw = ImageDraw.Draw(page)
+    content_width = PAGE_WIDTH_PX - 2 * MARGIN
+
+    # Header: title and site on the left, QR code and verification ID on the right.
+    text_width = content_width - QR_SIDE - 40
+    title_size = TITLE_SIZE
+    while title_size > SUBTITLE_SIZE and load_font(title_size, bold=True).getlength(template["title"]) > text_width:
+        title_size -= 2
+    draw.text((MARGIN, MARGIN), template["title"], font=load_font(title_size, bold=True), fill=0)
+    draw.text((MARGIN, MARGIN + 70), f"Imerys - Site de {site_name}", font=load_font(SUBTITLE_SIZE), fill=0)
+    draw.text((MARGIN, MARGIN + 115), "N° de vérification :", font=load_font(LABEL_SIZE), fill=0)
+    qr_box = (PAGE_WIDTH_PX - MARGIN - QR_SIDE, MARGIN - 20, QR_SIDE)
+    id_position = (MARGIN, MARGIN + 145)
+    id_size = SUBTITLE_SIZE
+    while id_size > LABEL_SIZE - 6:
+        id_font = load_font(id_size, bold=True)
+        widest_id = "PT-00000000-" + max("0123456789ABCDEF", key=id_font.getlength) * (2 * PERMIT_ID_BYTES)
+        if id_font.getlength(widest_id) <= text_width:
+            break
+        id_size -= 2
+    top = max(MARGIN + 210, qr_box[1] + QR_SIDE + 20)
+    draw.line((MARGIN, top - 15, MARGIN + content_width, top - 15), fill=0, width=3)
+
+    label_font = load_font(LABEL_SIZE)
+    fields = []
+    for spec in template["fields"]:
+        lines = spec.get("lines", 1)
+        draw.text((MARGIN, top), spec["label"], font=label_font, fill=0)
+        box_top = top + LABEL_SIZE + 8
+        box_height = lines * FIELD_LINE_HEIGHT + 8
+        draw.rectangle((MARGIN, box_top, MARGIN + content_width, box_top + box_height), outline=0, width=2)
+        fields.append(FieldBox(spec["name"], spec["label"], MARGIN + 12, box_top + 6, content_width - 24, lines))
+        top = box_top + box_height + FIELD_SPACING
+
+    top += 10
+    draw.text((MARGIN, top), "Vérifications avant travaux", font=load_font(SUBTITLE_SIZE, bold=True), fill=0)
+    top += 45
+    for item in template.get("checklist", []):
+        draw.rectangle((MARGIN, top, MARGIN + CHECKBOX_SIZE, top + CHECKBOX_SIZE), outline=0, width=2)
+        draw.text((MARGIN + CHECKBOX_SIZE + 16, top), item, font=label_font, fill=0)
+        top += CHECKBOX_SIZE + 14
+
+    signatures = template.get("signatures", [])
+    if signatures:
+        top = max(top + 20, PAGE_HEIGHT_PX - MARGIN - SIGNATURE_HEIGHT - LABEL_SIZE - 10)
+        width = content_width // len(signatures)
+        for index, label in enumerate(signatures):
+            left = MARGIN + index * width
+            draw.text((left + 8, top), label, font=label_font, fill=0)
+            draw.rectangle(
+                (left + 4, top + LABEL_SIZE + 10, left + width - 4, top + LABEL_SIZE + 10 + SIGNATURE_HEIGHT),
+                outline=0,
+                width=2,
+            )
+
+    return CompiledTemplate(template_id, template["title"], fields, page, qr_box, id_position, id_size)
+
+
+def render_permit(compiled, permit):
+    """Fills a compiled template with a permit's values and QR code. Returns the page image."""
+    page = compiled.base_page.copy()
+    draw = ImageDraw.Draw(page)
+    value_font = load_font(VALUE_SIZE)
+    for box in compiled.fields:
+        value = str(permit.values.get(box.name, "") or "")
+        for line_index, line in enumerate(wrap_text(value, value_font, box.width, box.lines)):
+            draw.text((box.left, box.top + line_index * FIELD_LINE_HEIGHT), line, font=value_font, fill=0)
+    draw.text(compiled.id_position, permit.permit_id, font=load_font(compiled.id_size, bold=True), fill=0)
+
+    left, top, side = compiled.qr_box
+    # One pixel per module, then a single nearest-neighbour upscale to the largest size that fits the box.
+    # The full quiet zone is kept: scanners miss codes printed this close to the page's text and lines.
+    qr_image = generate_qr_code(permit.qr_payload, box_size=1, border=DEFAULT_BORDER, renderer=RENDERER_FAST)
+    box_size = max(1, side // qr_image.width)
+    qr_image = qr_image.resize((qr_image.width * box_size, qr_image.height * box_size), Image.NEAREST)
+    offset = (side - qr_image.width) // 2
+    page.paste(qr_image, (left + offset, top + offset))
+    return page
+
+
+def write_permits_pdf(compiled, permits, fileobj, progress_callback=None):
+    """Streams one page per permit into a PDF written to `fileobj`."""
+    writer = StreamingPdfWriter(fileobj)
+    total = len(permits)
+    for index, permit in enumerate(permits, start=1):
+        writer.add_page(render_permit(compiled, permit))
+        if progress_callback:
+            progress_callback(index, total)
+    writer.close()
+
+
+def permits_pdf_bytes(compiled, permits, progress_callback=None):
+    """Returns the PDF of the given permits, built in memory."""
+    output = BytesIO()
+    write_permits_pdf(compiled, permits, output, progress_callback)
+    return output.getvalue()
+
+
+def _sniff_delimiter(raw_text):
+    """Returns the CSV delimiter: French-locale Excel writes semicolons, others commas or tabs."""
+    try:
+        return csv.Sniffer().sniff(raw_text[:4096], delimiters=CSV_DELIMITERS).delimiter
+    except csv.Error:  # A single column, or too few lines to tell
+        return ","
+
+
+def parse_permit_rows(raw_text, template_id):
+    """Parses CSV text with a header row of field names into one dict of values per permit.
+
+    Returns (rows, skipped): `skipped` lists the line numbers of the rows left
+    out because they name no permit holder. Raises ValueError when the header
+    contains none of the template's field names.
+    """
+    names = {spec["name"] for spec in load_permit_settings()["templates"][template_id]["fields"]}
+    reader = csv.DictReader(io.StringIO(raw_text), delimiter=_sniff_delimiter(raw_text))
+    header = {(name or "").strip() for name in reader.fieldnames or ()}
+    if not header & names:
+        raise ValueError(f"En-tête non reconnu : attendu {', '.join(sorted(names))}.")
+    rows, skipped = [], []
+    for row in reader:
+        values = {(name or "").strip(): (value or "").strip() for name, value in row.items() if isinstance(value, str)}
+        if not any(values.values()):
+            continue  # Blank line
+        if not values.get("holder"):
+            skipped.append(reader.line_num)
+            continue
+        rows.append({name: value for name, value in values.items() if name in names})
+    return rows, skipped
+
+
+class PermitRegistry:
+    """Durable SQLite record of issued permits, so their QR codes can be verified."""
+
+    def __init__(self, path=PERMITS_PATH):
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._lock = threading.Lock()
+        with self._lock:
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute(
+                """
+                CREATE TABLE IF NOT EXISTS permits (
+                    permit_id TEXT PRIMARY KEY,
+                    template_id TEXT NOT NULL,
+                    site TEXT NOT NULL,
+                    holder TEXT,
+                    company TEXT,
+                    values_json TEXT NOT NULL,
+                    issued_at REAL NOT NULL,
+                    valid_until REAL
+                )
+                """
+            )
+            self._conn.execute("CREATE INDEX IF NOT EXISTS permits_by_issue ON permits (issued_at)")
+
+    def issue_many(self, template_id, rows, site, validity_days=None):
+        """Creates and stores one permit per dict of values, in a single transaction. Returns the permits."""
+        if validity_days is None:
+            validity_days = load_permit_settings()["validity_days"]
+        now = time.time()
+        permits = [
+            Permit(new_permit_id(now), template_id, values, site, now, now + validity_days * 86400)
+            for values in rows
+        ]
+        with self._lock:
+            self._conn.execute("BEGIN")
+            try:
+                self._conn.executemany(
+                    "INSERT INTO permits "
+                    "(permit_id, template_id, site, holder, company, values_json, issued_at, valid_until) "
+                    "VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                    [
+                        (
+                            p.permit_id,
+                            p.template_id,
+                            p.site,
+                            p.values.get("holder"),
+                            p.values.get("company"),
+                            json.dumps(p.values, ensure_ascii=False),
+                            p.issued_at,
+                            p.valid_until,
+                        )
+                        for p in permits
+                    ],
+                )
+            except BaseException:
+                self._conn.execute("ROLLBACK")
+                raise
+            self._conn.execute("COMMIT")
+        return permits
+
+    def issue(self, template_id, values, site, validity_days=None):
+        """Creates and stores one permit."""
+        return self.issue_many(template_id, [values], site, validity_days)[0]
+
+    def issued_since(self, after_rowid=0):
+        """Returns the permits stored after `after_rowid`, oldest first.
+
+        Rows are (rowid, permit_id, template_id, holder, company, site, valid_until).
+        """
+        with self._lock:
+            return self._conn.execute(
+                "SELECT rowid, permit_id, template_id, holder, company, site, valid_until FROM permits "
+                "WHERE rowid > ? ORDER BY rowid",
+                (after_rowid,),
+            ).fetchall()
+
+
+_permit_registry = None
+_permit_registry_lock = threading.Lock()
+
+
+def get_permit_registry():
+    """Returns the process-wide permit registry, opening it on first use."""
+    global _permit_registry
+    with _permit_registry_lock:
+        if _permit_registry is None:
+            _permit_registry = PermitRegistry()
+        return _permit_registry
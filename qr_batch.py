@@ -0,0 +1,192 @@
+import csv
+import io
+import multiprocessing
+import os
+import re
+import tempfile
+import unicodedata
+import zipfile
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from io import BytesIO
+
+from PIL import Image, ImageDraw
+
+from pdf_pages import PAGE_HEIGHT_PX, PAGE_WIDTH_PX, StreamingPdfWriter, fit_text, load_font, wrap_text
+from qr_codes import render_qr_bytes
+
+# --- Batch Settings ---
+BATCH_INLINE_THRESHOLD = 50  # Below this many codes, rendering a process pool costs more than it saves
+BATCH_WINDOW_PER_WORKER = 8  # Codes in flight per worker, bounds memory for large batches
+SPOOL_MAX_SIZE = 16 * 1024 * 1024  # Archives larger than this spill to a temporary file
+CSV_DELIMITERS = ",;\t"  # Delimiters recognized between data and label
+# A first line whose data cell is one of these is a `data,label` header: only then, or when the user
+# asks for it, is a label column read.
+BATCH_HEADER_NAMES = {"data", "donnée", "données", "texte", "text", "url", "contenu", "code"}
+
+# --- PDF Sheet Layout ---
+SHEET_COLUMNS = 3
+SHEET_ROWS = 4
+SHEET_MARGIN_PX = 40
+LABEL_HEIGHT_PX = 36
+LABEL_PADDING_PX = 12  # Kept clear between the captions of neighbouring codes
+LABEL_FONT_SIZE = 24
+LABEL_MIN_FONT_SIZE = 16  # Long labels shrink down to this size, then wrap on LABEL_MAX_LINES lines
+LABEL_MAX_LINES = 2
+
+
+def _header_delimiter(first_line):
+    """Returns the delimiter of a recognized `data,label` header line, "" for a lone `data` header, else None."""
+    delimiter = min((char for char in CSV_DELIMITERS if char in first_line), key=first_line.index, default="")
+    data_cell = first_line.split(delimiter)[0] if delimiter else first_line
+    if data_cell.strip().strip('"').lower() in BATCH_HEADER_NAMES:
+        return delimiter
+    return None
+
+
+def parse_batch_input(raw_text, with_labels=False):
+    """Parses a newline list, or a CSV of data and labels, into (label, data) pairs.
+
+    By default each non-empty line is encoded whole, so URLs keep their commas
+    and semicolons. A label column is only read when the first line is a
+    recognized `data,label` header (its delimiter is then used), or when
+    `with_labels` is set (the delimiter is then detected). Labels name the
+    files and are printed as captions; without one, the data is used.
+    """
+    lines = raw_text.splitlines()
+    first_line = next((line for line in lines if line.strip()), "")
+    delimiter = _header_delimiter(first_line)
+    has_header = delimiter is not None
+    if not has_header and with_labels:
+        try:
+            delimiter = csv.Sniffer().sniff(raw_text[:4096], delimiters=CSV_DELIMITERS).delimiter
+        except csv.Error:  # A single column, or too few lines to tell
+            delimiter = ","
+    if not delimiter:
+        rows = ([line] for line in lines)
+    else:
+        rows = csv.reader(io.StringIO(raw_text), delimiter=delimiter)
+
+    items = []
+    for row in rows:
+        if not row or not row[0].strip():
+            continue
+        if has_header:
+            has_header = False  # Skips the header line itself
+            continue
+        data = row[0].strip()
+        label = row[1].strip() if len(row) > 1 and row[1].strip() else data
+        items.append((label, data))
+    return items
+
+
+def render_qr_png(item):
+    """Renders one (label, data) pair to PNG bytes. Runs inside the worker processes."""
+    label, data = item
+    return label, render_qr_bytes(data)
+
+
+def iter_rendered(items, max_workers=None):
+    """Yields (label, png_bytes) for each item, in input order, rendering them across a process pool.
+
+    Only a bounded window of codes is in flight at any time, so the batch is
+    never held in memory as a whole.
+    """
+    if len(items) < BATCH_INLINE_THRESHOLD:
+        for item in items:
+            yield render_qr_png(item)
+        return
+
+    max_workers = max_workers or os.cpu_count() or 1
+    window = max_workers * BATCH_WINDOW_PER_WORKER
+    # Streamlit serves sessions from threads, which makes forking unsafe.
+    context = multiprocessing.get_context("spawn")
+    with ProcessPoolExecutor(max_workers=max_workers, mp_context=context) as executor:
+        pending = deque()
+        next_index = 0
+        while pending or next_index < len(items):
+            while len(pending) < window and next_index < len(items):
+                pending.append(executor.submit(render_qr_png, items[next_index]))
+                next_index += 1
+            yield pending.popleft().result()
+
+
+def _safe_file_name(label):
+    """Turns a label into a file-system friendly name, keeping accented letters as their base letter."""
+    ascii_label = unicodedata.normalize("NFKD", label).encode("ascii", "ignore").decode("ascii")
+    return re.sub(r"[^A-Za-z0-9._-]+", "_", ascii_label).strip("_")[:80] or "qr_code"
+
+
+def write_zip(rendered, total, fileobj, progress_callback=None):
+    """Streams rendered QR codes into a ZIP archive written to `fileobj`."""
+    # PNG data is already deflated, so storing it avoids a second useless compression pass.
+    with zipfile.ZipFile(fileobj, "w", compression=zipfile.ZIP_STORED) as archive:
+        for index, (label, png) in enumerate(rendered, start=1):
+            archive.writestr(f"{index:05d}_{_safe_file_name(label)}.png", png)
+            if progress_callback:
+                progress_callback(index, total)
+
+
+def _fit_label(label, width):
+    """Returns the font and the lines of a caption that fit under a code `width` pixels wide."""
+    for size in range(LABEL_FONT_SIZE, LABEL_MIN_FONT_SIZE - 1, -2):
+        font = load_font(size)
+        if font.getlength(label) <= width:
+            return font, [label]
+    font = load_font(LABEL_MIN_FONT_SIZE)
+    lines = wrap_text(label, font, width, LABEL_MAX_LINES)
+    if " ".join(lines) != " ".join(label.split()):  # Words left out: the last line says so
+        lines[-1] += "…"
+    return font, [fit_text(line, font, width) for line in lines]
+
+
+def write_pdf(rendered, total, fileobj, progress_callback=None):
+    """Streams rendered QR codes into a printable multi-page PDF sheet written to `fileobj`."""
+    cell_width = (PAGE_WIDTH_PX - 2 * SHEET_MARGIN_PX) // SHEET_COLUMNS
+    cell_height = (PAGE_HEIGHT_PX - 2 * SHEET_MARGIN_PX) // SHEET_ROWS
+    qr_side = min(cell_width, cell_height - LABEL_HEIGHT_PX)
+    per_page = SHEET_COLUMNS * SHEET_ROWS
+
+    writer = StreamingPdfWriter(fileobj)
+    page = None
+    for index, (label, png) in enumerate(rendered):
+        slot = index % per_page
+        if slot == 0:
+            if page is not None:
+                writer.add_page(page)
+            page = Image.new("1", (PAGE_WIDTH_PX, PAGE_HEIGHT_PX), 1)
+            draw = ImageDraw.Draw(page)
+
+        column, row = slot % SHEET_COLUMNS, slot // SHEET_COLUMNS
+        left = SHEET_MARGIN_PX + column * cell_width
+        top = SHEET_MARGIN_PX + row * cell_height
+        with Image.open(BytesIO(png)) as qr_image:
+            qr_image = qr_image.convert("1").resize((qr_side, qr_side), Image.NEAREST)
+        page.paste(qr_image, (left + (cell_width - qr_side) // 2, top))
+        label_font, lines = _fit_label(label, cell_width - LABEL_PADDING_PX)
+        for line_index, line in enumerate(lines):
+            draw.text(
+                (left + cell_width // 2, top + qr_side + LABEL_HEIGHT_PX * (2 * line_index + 1) // (2 * len(lines))),
+                line,
+                fill=0,
+                font=label_font,
+                anchor="mm",
+            )
+        if progress_callback:
+            progress_callback(index + 1, total)
+
+    if page is not None:
+        writer.add_page(page)
+    writer.close()
+
+
+def build_batch_archive(items, output_format="zip", progress_callback=None, max_workers=None):
+    """Renders all items and returns a rewound file object holding the ZIP archive or PDF sheet."""
+    output = tempfile.SpooledTemporaryFile(max_size=SPOOL_MAX_SIZE)
+    rendered = iter_rendered(items, max_workers=max_workers)
+    if output_format == "pdf":
+        write_pdf(rendered, len(items), output, progress_callback)
+    else:
+        write_zip(rendered, len(items), output, progress_callback)
+    output.seek(0)
+    return output
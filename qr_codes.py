@@ -0,0 +1,238 @@
+import hashlib
+import threading
+from collections import OrderedDict
+from io import BytesIO
+
+import qrcode
+from PIL import Image, ImageColor
+
+from metrics import count, span, timed
+
+# --- QR Code Defaults ---
+DEFAULT_ERROR_CORRECTION = qrcode.constants.ERROR_CORRECT_L
+DEFAULT_BOX_SIZE = 10
+DEFAULT_BORDER = 4
+DEFAULT_FILL_COLOR = "black"
+DEFAULT_BACK_COLOR = "white"
+DEFAULT_TEXT = "https://www.imerys.com"  # Pre-filled on the QR code page
+QR_CACHE_SIZE = 256  # Number of distinct QR codes kept in memory
+
+# --- Renderers ---
+RENDERER_PIL = "pil"  # qrcode's PIL image factory, draws one rectangle per module
+RENDERER_FAST = "fast"  # Whole module matrix upscaled in one nearest-neighbour resize
+DEFAULT_RENDERER = RENDERER_FAST
+
+
+def build_qr(text, error_correction=DEFAULT_ERROR_CORRECTION, box_size=DEFAULT_BOX_SIZE, border=DEFAULT_BORDER):
+    """Builds the QR code matrix for the given text."""
+    qr = qrcode.QRCode(
+        version=1,
+        error_correction=error_correction,
+        box_size=box_size,
+        border=border,
+    )
+    qr.add_data(text)
+    qr.make(fit=True)
+    return qr
+
+
+def render_qr_image(matrix, box_size=DEFAULT_BOX_SIZE, fill_color=DEFAULT_FILL_COLOR, back_color=DEFAULT_BACK_COLOR):
+    """Renders a boolean module matrix (border included) to a PIL image in bulk.
+
+    The output is pixel-identical to qrcode's PIL image factory: same mode,
+    same colors, `box_size` pixels per module.
+    """
+    width = len(matrix)
+    # One byte per module (1 = dark), mapped to black/white through a lookup table.
+    modules = Image.frombytes("L", (width, width), b"".join(bytes(row) for row in matrix))
+    mask = modules.point(lambda value: 255 if value else 0)
+    mask = mask.resize((width * box_size, width * box_size), Image.NEAREST)
+
+    fill = fill_color.lower() if isinstance(fill_color, str) else fill_color
+    back = back_color.lower() if isinstance(back_color, str) else back_color
+    if fill == "black" and back == "white":
+        return mask.point(lambda value: 0 if value else 255).convert("1", dither=Image.Dither.NONE)
+
+    if back == "transparent":
+        mode, back = "RGBA", None
+    else:
+        mode = "RGB"
+        back = ImageColor.getcolor(back, mode) if isinstance(back, str) else back
+    fill = ImageColor.getcolor(fill, mode) if isinstance(fill, str) else fill
+    img = Image.new(mode, mask.size, back)
+    img.paste(fill, (0, 0), mask)
+    return img
+
+
+def render_qr_svg(matrix, box_size=DEFAULT_BOX_SIZE, fill_color=DEFAULT_FILL_COLOR, back_color=DEFAULT_BACK_COLOR):
+    """Renders a boolean module matrix (border included) to an SVG document.
+
+    Runs of dark modules on each row are merged into a single path segment.
+    """
+    width = len(matrix)
+    segments = []
+    for y, row in enumerate(matrix):
+        x = 0
+        while x < width:
+            if row[x]:
+                start = x
+                while x < width and row[x]:
+                    x += 1
+                segments.append(f"M{start},{y}h{x - start}v1h-{x - start}z")
+            else:
+                x += 1
+
+    background = "" if back_color == "transparent" else f'<rect width="{width}" height="{width}" fill="{back_color}"/>'
+    size = width * box_size
+    return (
+        f'<svg xmlns="http://www.w3.org/2000/svg" width="{size}" height="{size}" '
+        f'viewBox="0 0 {width} {width}" shape-rendering="crispEdges">'
+        f'{background}<path fill="{fill_color}" d="{"".join(segments)}"/></svg>'
+    )
+
+
+@timed("qr_generate")
+def generate_qr_code(
+    text,
+    error_correction=DEFAULT_ERROR_CORRECTION,
+    box_size=DEFAULT_BOX_SIZE,
+    border=DEFAULT_BORDER,
+    fill_color=DEFAULT_FILL_COLOR,
+    back_color=DEFAULT_BACK_COLOR,
+    renderer=RENDERER_PIL,
+):
+    """Generates a QR code PIL image from the given text.
+
+    `renderer` selects qrcode's per-module PIL drawing (RENDERER_PIL) or the
+    bulk renderer (RENDERER_FAST); both return a PIL.Image.Image with the same pixels.
+    """
+    qr = build_qr(text, error_correction, box_size, border)
+    if renderer == RENDERER_FAST:
+        return render_qr_image(qr.get_matrix(), box_size, fill_color, back_color)
+    img = qr.make_image(fill_color=fill_color, back_color=back_color)
+    return img.get_image()  # Unwrapped from qrcode's PilImage, as the bulk renderer returns it
+
+
+def generate_qr_code_svg(
+    text,
+    error_correction=DEFAULT_ERROR_CORRECTION,
+    box_size=DEFAULT_BOX_SIZE,
+    border=DEFAULT_BORDER,
+    fill_color=DEFAULT_FILL_COLOR,
+    back_color=DEFAULT_BACK_COLOR,
+):
+    """Generates a QR code SVG document from the given text."""
+    qr = build_qr(text, error_correction, box_size, border)
+    return render_qr_svg(qr.get_matrix(), box_size, fill_color, back_color)
+
+
+def qr_code_key(
+    text,
+    error_correction=DEFAULT_ERROR_CORRECTION,
+    box_size=DEFAULT_BOX_SIZE,
+    border=DEFAULT_BORDER,
+    fill_color=DEFAULT_FILL_COLOR,
+    back_color=DEFAULT_BACK_COLOR,
+    fmt="png",
+):
+    """Returns the content address (SHA-256 hex digest) of a QR code, its rendering options and output format."""
+    parts = [text, str(error_correction), str(box_size), str(border), str(fill_color), str(back_color), fmt]
+    return hashlib.sha256("\x1f".join(parts).encode("utf-8")).hexdigest()
+
+
+def render_qr_bytes(text, fmt="png", **options):
+    """Renders the QR code for `text` to PNG or SVG bytes with the bulk renderer."""
+    if fmt == "svg":
+        return generate_qr_code_svg(text, **options).encode("utf-8")
+    img = generate_qr_code(text, renderer=DEFAULT_RENDERER, **options)
+    img_buffer = BytesIO()
+    with span("png_encode"):
+        img.save(img_buffer, format="PNG")
+    return img_buffer.getvalue()
+
+
+class QRCodeCache:
+    """Bounded LRU cache of encoded QR codes (PNG or SVG), keyed by content address.
+
+    The cache is shared by all Streamlit sessions of the process, so every
+    access is guarded by a lock.
+    """
+
+    def __init__(self, maxsize=QR_CACHE_SIZE):
+        self.maxsize = maxsize
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def lookup(self, key):
+        """Returns the cached data for a content address, or None without building anything."""
+        with self._lock:
+            data = self._entries.get(key)
+            if data is not None:
+                self._entries.move_to_end(key)
+                self.hits += 1
+        if data is not None:
+            count("qr_cache_hit")
+        return data
+
+    def get(self, text, fmt="png", **options):
+        """Returns the encoded QR code for `text` in `fmt`, building and caching it on a miss."""
+        key = qr_code_key(text, fmt=fmt, **options)
+        data = self.lookup(key)
+        if data is not None:
+            return data
+        with self._lock:
+            self.misses += 1
+        count("qr_cache_miss")
+
+        # Build outside the lock so a slow encode does not block other sessions.
+        data = render_qr_bytes(text, fmt, **options)
+
+        with self._lock:
+            self._entries[key] = data
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+        return data
+
+    def get_png(self, text, **options):
+        """Returns the PNG bytes of the QR code for `text`."""
+        return self.get(text, "png", **options)
+
+    def get_svg(self, text, **options):
+        """Returns the SVG document of the QR code for `text`, as UTF-8 bytes."""
+        return self.get(text, "svg", **options)
+
+    def stats(self):
+        """Returns the hit/miss counters and current size of the cache."""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+                "size": len(self._entries),
+                "maxsize": self.maxsize,
+            }
+
+    def clear(self):
+        """Empties the cache and resets its counters."""
+        with self._lock:
+            self._entries.clear()
+            self.hits = 0
+            self.misses = 0
+
+
+# Process-wide cache, shared across reruns and sessions (modules are only imported once).
+qr_cache = QRCodeCache()
+
+
+def generate_qr_code_png(text, **options):
+    """Returns the PNG bytes of the QR code for `text`, served from the process-wide cache."""
+    return qr_cache.get_png(text, **options)
+
+
+def generate_qr_code_svg_bytes(text, **options):
+    """Returns the SVG bytes of the QR code for `text`, served from the process-wide cache."""
+    return qr_cache.get_svg(text, **options)
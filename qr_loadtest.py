@@ -0,0 +1,112 @@
+import argparse
+import asyncio
+import json
+import statistics
+import time
+from urllib.parse import quote, urlsplit
+
+
+def percentile(sorted_values, fraction):
+    """Returns the value at `fraction` (0-1) of an already sorted list."""
+    if not sorted_values:
+        return 0.0
+    return sorted_values[min(len(sorted_values) - 1, int(fraction * len(sorted_values)))]
+
+
+async def _read_response(reader):
+    """Reads one HTTP/1.1 response with a Content-Length body. Returns (status, headers)."""
+    status_line = await reader.readline()
+    if not status_line:
+        raise ConnectionError("Connection closed by server")
+    status = int(status_line.split()[1])
+    headers = {}
+    while True:
+        line = await reader.readline()
+        if line in (b"\r\n", b""):
+            break
+        name, _, value = line.decode("latin-1").partition(":")
+        headers[name.strip().lower()] = value.strip()
+    length = int(headers.get("content-length", 0))
+    if length:
+        await reader.readexactly(length)
+    return status, headers
+
+
+async def _client(host, port, paths, deadline_count, counter, latencies, statuses, conditional):
+    """Sends requests over one keep-alive connection until `deadline_count` requests have been issued."""
+    reader, writer = await asyncio.open_connection(host, port)
+    etags = {}
+    try:
+        while counter[0] < deadline_count:
+            index = counter[0]
+            counter[0] += 1
+            path = paths[index % len(paths)]
+            extra = f"If-None-Match: {etags[path]}\r\n" if conditional and path in etags else ""
+            request = f"GET {path} HTTP/1.1\r\nHost: {host}\r\n{extra}\r\n".encode("ascii")
+            started = time.perf_counter()
+            writer.write(request)
+            status, headers = await _read_response(reader)
+            latencies.append(time.perf_counter() - started)
+            statuses[status] = statuses.get(status, 0) + 1
+            if "etag" in headers:
+                etags[path] = headers["etag"]
+    finally:
+        writer.close()
+
+
+async def run_load_test(url, requests, concurrency, distinct, fmt, conditional):
+    """Fires `requests` GETs at the /qr endpoint over `concurrency` connections and returns a summary."""
+    parts = urlsplit(url)
+    host, port = parts.hostname, parts.port or 80
+    base = parts.path.rstrip("/") or ""
+    paths = [f"{base}/qr?data={quote(f'https://www.imerys.com/asset/{i}')}&fmt={fmt}" for i in range(distinct)]
+    counter, latencies, statuses = [0], [], {}
+
+    started = time.perf_counter()
+    await asyncio.gather(
+        *(
+            _client(host, port, paths, requests, counter, latencies, statuses, conditional)
+            for _ in range(concurrency)
+        )
+    )
+    elapsed = time.perf_counter() - started
+
+    latencies.sort()
+    return {
+        "url": url,
+        "requests": len(latencies),
+        "concurrency": concurrency,
+        "distinct_payloads": distinct,
+        "format": fmt,
+        "conditional": conditional,
+        "elapsed_s": round(elapsed, 3),
+        "throughput_rps": round(len(latencies) / elapsed, 1),
+        "latency_ms": {
+            "mean": round(statistics.fmean(latencies) * 1000, 3),
+            "p50": round(percentile(latencies, 0.50) * 1000, 3),
+            "p95": round(percentile(latencies, 0.95) * 1000, 3),
+            "p99": round(percentile(latencies, 0.99) * 1000, 3),
+            "max": round(latencies[-1] * 1000, 3),
+        },
+        "statuses": statuses,
+    }
+
+
+def main():
+    """Load-tests a running qr_server.py and prints a JSON summary."""
+    parser = argparse.ArgumentParser(description="Load test for the headless QR endpoint.")
+    parser.add_argument("--url", default="http://127.0.0.1:8502")
+    parser.add_argument("--requests", type=int, default=20000)
+    parser.add_argument("--concurrency", type=int, default=64)
+    parser.add_argument("--distinct", type=int, default=50, help="Number of different payloads cycled through.")
+    parser.add_argument("--fmt", choices=["png", "svg"], default="png")
+    parser.add_argument("--conditional", action="store_true", help="Revalidate with If-None-Match (304 path).")
+    args = parser.parse_args()
+    summary = asyncio.run(
+        run_load_test(args.url, args.requests, args.concurrency, args.distinct, args.fmt, args.conditional)
+    )
+    print(json.dumps(summary, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,137 @@
+import argparse
+import asyncio
+import os
+
+import qrcode
+from starlette.applications import Starlette
+from starlette.responses import PlainTextResponse, Response
+from starlette.routing import Route
+
+from metrics import metrics
+from qr_codes import DEFAULT_BORDER, DEFAULT_BOX_SIZE, qr_cache, qr_code_key
+
+# --- Endpoint Settings ---
+ERROR_CORRECTION_LEVELS = {
+    "L": qrcode.constants.ERROR_CORRECT_L,
+    "M": qrcode.constants.ERROR_CORRECT_M,
+    "Q": qrcode.constants.ERROR_CORRECT_Q,
+    "H": qrcode.constants.ERROR_CORRECT_H,
+}
+MEDIA_TYPES = {"png": "image/png", "svg": "image/svg+xml"}
+MAX_DATA_LENGTH = 2953  # Largest payload a version 40 code can hold (binary, level L)
+MAX_BOX_SIZE = 50
+MAX_BORDER = 20
+MAX_OUTPUT_SIDE = 2000  # Pixels per side of a rendered code, border included
+RENDER_CONCURRENCY = os.cpu_count() or 1  # Cache misses rendered at once; the others wait their turn
+# Responses are content-addressed: the same URL always yields the same bytes.
+CACHE_CONTROL = "public, max-age=86400, immutable"
+
+
+_render_slots = asyncio.Semaphore(RENDER_CONCURRENCY)
+
+
+def _bad_request(message):
+    return PlainTextResponse(message, status_code=400)
+
+
+def _int_param(params, name, default, low, high):
+    """Reads an integer query parameter within [low, high], or returns None if it is invalid."""
+    try:
+        value = int(params.get(name, default))
+    except ValueError:
+        return None
+    return value if low <= value <= high else None
+
+
+def _render_within_limits(data, fmt, options):
+    """Renders a QR code through the cache, or returns None if it would exceed MAX_OUTPUT_SIDE pixels per side."""
+    qr = qrcode.QRCode(error_correction=options["error_correction"])
+    qr.add_data(data)
+    modules = qr.best_fit() * 4 + 17  # Sized from the data alone, before any module is placed
+    if (modules + 2 * options["border"]) * options["box_size"] > MAX_OUTPUT_SIDE:
+        return None
+    return qr_cache.get(data, fmt, **options)
+
+
+async def qr_endpoint(request):
+    """GET /qr?data=...&ec=L&box=10&border=4&fmt=png|svg"""
+    params = request.query_params
+    data = params.get("data", "")
+    if not data or len(data) > MAX_DATA_LENGTH:
+        return _bad_request(f"'data' is required and limited to {MAX_DATA_LENGTH} characters.")
+    error_correction = ERROR_CORRECTION_LEVELS.get(params.get("ec", "L").upper())
+    if error_correction is None:
+        return _bad_request("'ec' must be one of L, M, Q, H.")
+    box_size = _int_param(params, "box", DEFAULT_BOX_SIZE, 1, MAX_BOX_SIZE)
+    border = _int_param(params, "border", DEFAULT_BORDER, 0, MAX_BORDER)
+    if box_size is None or border is None:
+        return _bad_request(f"'box' must be 1-{MAX_BOX_SIZE} and 'border' 0-{MAX_BORDER}.")
+    fmt = params.get("fmt", "png").lower()
+    if fmt not in MEDIA_TYPES:
+        return _bad_request("'fmt' must be png or svg.")
+
+    options = {"error_correction": error_correction, "box_size": box_size, "border": border}
+    key = qr_code_key(data, fmt=fmt, **options)
+    headers = {"ETag": f'"{key}"', "Cache-Control": CACHE_CONTROL}
+
+    # The ETag is known before rendering, so revalidations never touch the cache or the encoder.
+    if_none_match = request.headers.get("if-none-match", "")
+    client_tags = {tag.strip().removeprefix("W/") for tag in if_none_match.split(",")}
+    if if_none_match == "*" or headers["ETag"] in client_tags:
+        return Response(status_code=304, headers=headers)
+
+    body = qr_cache.lookup(key)
+    if body is None:
+        # Rendering is CPU-bound: keep the event loop free for cache hits and revalidations, and
+        # bound how many renders (and their images) are in memory at once.
+        try:
+            async with _render_slots:
+                body = await asyncio.to_thread(_render_within_limits, data, fmt, options)
+        # qrcode reports data that would need a version above 40 as a ValueError.
+        except (qrcode.exceptions.DataOverflowError, ValueError):
+            return _bad_request("'data' does not fit in a QR code at this error correction level.")
+        if body is None:
+            return _bad_request(f"The code would exceed {MAX_OUTPUT_SIDE} px per side: lower 'box' or 'border'.")
+    return Response(body, media_type=MEDIA_TYPES[fmt], headers=headers)
+
+
+async def stats_endpoint(request):
+    """GET /qr/stats: hit/miss counters of the shared QR cache."""
+    return PlainTextResponse("\n".join(f"{name} {value}" for name, value in qr_cache.stats().items()))
+
+
+async def metrics_endpoint(request):
+    """GET /metrics: spans and counters of this worker, in the Prometheus text format (EHS_METRICS=1)."""
+    return PlainTextResponse(metrics.render_prometheus(), media_type="text/plain; version=0.0.4")
+
+
+app = Starlette(
+    routes=[
+        Route("/qr", qr_endpoint, methods=["GET", "HEAD"]),
+        Route("/qr/stats", stats_endpoint),
+        Route("/metrics", metrics_endpoint),
+    ]
+)
+
+
+def main():
+    """Runs the QR endpoint under uvicorn."""
+    import uvicorn
+
+    parser = argparse.ArgumentParser(description="Headless QR code HTTP endpoint.")
+    parser.add_argument("--host", default="0.0.0.0")
+    parser.add_argument("--port", type=int, default=8502)
+    parser.add_argument("--workers", type=int, default=1, help="Worker processes, one per core for peak throughput.")
+    args = parser.parse_args()
+    uvicorn.run(
+        "qr_server:app",
+        host=args.host,
+        port=args.port,
+        workers=args.workers,
+        access_log=False,
+        log_level="warning",
+    )
+
+
+if __name__ == "__main__":
+    main()
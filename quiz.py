@@ -0,0 +1,73 @@
+import hashlib
+import json
+import random
+from dataclasses import dataclass, field
+
+# --- Stored Answers ---
+# One character per question of the bank, so reports can compare results as fixed-width arrays.
+ANSWER_SYMBOLS = "0123456789abcdefghijklmnopqrstuvwxyz"  # Option index -> stored character
+ANSWER_NOT_ASKED = "-"  # Question not drawn, or left unanswered
+
+
+@dataclass(slots=True)
+class QuizState:
+    """Answers and running score of one visitor's quiz.
+
+    Only the sampled questions are tracked, so the cost of a rerun depends on
+    the sample size, not on the size of the question bank. Slotted: one is
+    kept in every visitor's session state.
+    """
+
+    bank_id: str  # Identifies the question bank the sample was drawn from
+    question_indices: tuple  # Positions in the bank, in display order
+    answers: dict = field(default_factory=dict)  # Display position -> chosen option index
+    score: int = 0
+    # Stored result, set once the answers are submitted; they are final from then on
+    result_id: int = None
+    badge_id: str = None
+
+    @property
+    def total(self):
+        return len(self.question_indices)
+
+    @property
+    def answered(self):
+        return len(self.answers)
+
+
+def start_quiz(questions, bank_id, sample_size=None, rng=random):
+    """Draws the questions of a new quiz: all of them in order, or a random sample of `sample_size`."""
+    if sample_size and sample_size < len(questions):
+        question_indices = tuple(rng.sample(range(len(questions)), sample_size))
+    else:
+        question_indices = tuple(range(len(questions)))
+    return QuizState(bank_id, question_indices)
+
+
+def bank_fingerprint(questions):
+    """Returns a short digest of a question bank, stored with each result's answers.
+
+    Editing a question, its options or its answer key changes it, so answers
+    given to an earlier version of the bank are never scored against the new one.
+    """
+    content = [(question["question"], question["options"], question["answer_index"]) for question in questions]
+    return hashlib.sha256(json.dumps(content, ensure_ascii=False).encode("utf-8")).hexdigest()[:16]
+
+
+def encode_answers(state, bank_size):
+    """Returns the answers as one character per question of the bank, for storage with the result."""
+    symbols = [ANSWER_NOT_ASKED] * bank_size
+    for position, option_index in state.answers.items():
+        symbols[state.question_indices[position]] = ANSWER_SYMBOLS[option_index]
+    return "".join(symbols)
+
+
+def record_answer(state, questions, position, option_index):
+    """Sets (or clears, with None) the answer at `position` and adjusts the score by the delta."""
+    correct_index = questions[state.question_indices[position]]["answer_index"]
+    previous_index = state.answers.get(position)
+    state.score += (option_index == correct_index) - (previous_index == correct_index)
+    if option_index is None:
+        state.answers.pop(position, None)
+    else:
+        state.answers[position] = option_index
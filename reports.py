@@ -0,0 +1,184 @@
+import csv
+import io
+import os
+import sqlite3
+import time
+
+import numpy as np
+import pandas as pd
+
+from quiz import ANSWER_NOT_ASKED, ANSWER_SYMBOLS, bank_fingerprint
+from results_store import INDUCTION_VALIDITY_DAYS, RESULTS_PATH, normalize_email
+from sites import load_sites
+
+# --- Report Settings ---
+REPORT_CHUNK_ROWS = 100_000  # Rows read from the results store at a time; bounds the report's memory
+REPORT_TIMEZONE = os.environ.get("EHS_REPORT_TIMEZONE", "Europe/Brussels")  # Month boundaries
+
+# --- Contractor Status ---
+STATUS_VALID = "valid"
+STATUS_EXPIRED = "expired"
+STATUS_NEVER_INDUCTED = "never_inducted"  # Only failed attempts, or listed in the roster without any result
+
+
+def iter_result_chunks(columns, path=RESULTS_PATH, since=None, where=None, chunk_rows=REPORT_CHUNK_ROWS):
+    """Yields the stored results as DataFrames of at most `chunk_rows` rows, oldest first.
+
+    Reads through a separate read-only connection: in WAL mode it neither
+    blocks nor waits for the app's writes.
+    """
+    conditions = [where] if where else []
+    params = []
+    if since is not None:
+        conditions.append("completed_at >= ?")
+        params.append(since)
+    query = f"SELECT {', '.join(columns)} FROM induction_results"
+    if conditions:
+        query += " WHERE " + " AND ".join(conditions)
+    if not os.path.exists(path):
+        return  # Nothing recorded yet
+    conn = sqlite3.connect(f"file:{path}?mode=ro", uri=True)
+    try:
+        yield from pd.read_sql_query(query + " ORDER BY id", conn, params=params, chunksize=chunk_rows)
+    finally:
+        conn.close()
+
+
+def monthly_pass_rates(path=RESULTS_PATH, since=None, chunk_rows=REPORT_CHUNK_ROWS):
+    """Returns attempts, passes and pass rate per month and company."""
+    totals = None
+    for chunk in iter_result_chunks(("company", "passed", "completed_at"), path, since, chunk_rows=chunk_rows):
+        completed = pd.to_datetime(chunk["completed_at"], unit="s", utc=True).dt.tz_convert(REPORT_TIMEZONE)
+        month = (completed.dt.year * 100 + completed.dt.month).rename("month")  # 202410; formatted once at the end
+        partial = chunk.groupby([month, "company"])["passed"].agg(["count", "sum"])
+        totals = partial if totals is None else totals.add(partial, fill_value=0)
+    if totals is None:
+        return pd.DataFrame(columns=["month", "company", "attempts", "passed", "pass_rate"])
+    report = totals.astype("int64").rename(columns={"count": "attempts", "sum": "passed"}).reset_index()
+    report["month"] = (report["month"] // 100).astype(str) + "-" + (report["month"] % 100).astype(str).str.zfill(2)
+    report["pass_rate"] = report["passed"] / report["attempts"]
+    return report.sort_values(["month", "company"], ignore_index=True)
+
+
+def question_failure_rates(path=RESULTS_PATH, since=None, chunk_rows=REPORT_CHUNK_ROWS):
+    """Returns, per site and quiz question, how often it was answered and how often wrongly.
+
+    Stored answers are fixed-width strings, so each chunk becomes one
+    (results x questions) byte matrix compared with the answer key at once.
+    Only answers given to a registered site's current question bank are
+    scored: results for sites no longer in sites.json, or for another version
+    of the bank (different fingerprint), are left out. Results stored before
+    fingerprints were kept are scored if the bank still has their length.
+    """
+    sites, _ = load_sites()
+    fingerprints = {}  # site -> fingerprint of its current bank
+    counts = {}  # site -> (answered per question, failed per question)
+    columns = ("site", "answers", "bank_fingerprint")
+    for chunk in iter_result_chunks(columns, path, since, "answers IS NOT NULL", chunk_rows):
+        for site_id, results in chunk.groupby("site"):
+            if site_id not in sites:
+                continue  # No answer key to score against; another site's would mislabel every question
+            questions = sites[site_id].content.quiz_questions
+            if site_id not in fingerprints:
+                fingerprints[site_id] = bank_fingerprint(questions)
+            stored = results["bank_fingerprint"]
+            answers = results["answers"][
+                (stored == fingerprints[site_id]) | (stored.isna() & (results["answers"].str.len() == len(questions)))
+            ]
+            if answers.empty:
+                continue
+            matrix = np.frombuffer("".join(answers).encode("ascii"), dtype=np.uint8).reshape(-1, len(questions))
+            answer_key = np.frombuffer(
+                "".join(ANSWER_SYMBOLS[question["answer_index"]] for question in questions).encode("ascii"),
+                dtype=np.uint8,
+            )
+            answered = matrix != ord(ANSWER_NOT_ASKED)
+            failed = answered & (matrix != answer_key)
+            site_answered, site_failed = counts.get(site_id, (0, 0))
+            counts[site_id] = (site_answered + answered.sum(axis=0), site_failed + failed.sum(axis=0))
+
+    rows = []
+    for site_id, (answered, failed) in counts.items():
+        questions = sites[site_id].content.quiz_questions
+        for index, question in enumerate(questions):
+            rows.append(
+                {
+                    "site": site_id,
+                    "question_number": index + 1,
+                    "question": question["question"],
+                    "answered": int(answered[index]),
+                    "failed": int(failed[index]),
+                    "failure_rate": failed[index] / answered[index] if answered[index] else 0.0,
+                }
+            )
+    columns = ["site", "question_number", "question", "answered", "failed", "failure_rate"]
+    return pd.DataFrame(rows, columns=columns).sort_values("failure_rate", ascending=False, ignore_index=True)
+
+
+def read_roster(raw_text):
+    """Parses a contractor roster CSV with an `email` column (and optional `name`, `company`)."""
+    rows = [row for row in csv.DictReader(io.StringIO(raw_text)) if (row.get("email") or "").strip()]
+    roster = pd.DataFrame(
+        {
+            "email_key": [normalize_email(row["email"]) for row in rows],
+            "name": [(row.get("name") or "").strip() for row in rows],
+            "company": [(row.get("company") or "").strip() for row in rows],
+        }
+    )
+    return roster.drop_duplicates("email_key", keep="last").set_index("email_key")
+
+
+def contractor_status(path=RESULTS_PATH, roster=None, now=None, chunk_rows=REPORT_CHUNK_ROWS):
+    """Returns every known contractor with their last attempt, last pass, expiry and status.
+
+    Contractors are everyone with a stored result, plus the `roster` (from
+    read_roster) so that people who never started the induction are listed too.
+    """
+    people = None
+    columns = ("email_key", "name", "company", "passed", "completed_at")
+    for chunk in iter_result_chunks(columns, path, chunk_rows=chunk_rows):
+        chunk["passed_at"] = chunk["completed_at"].where(chunk["passed"] == 1)
+        partial = chunk.groupby("email_key").agg(
+            name=("name", "last"),
+            company=("company", "last"),
+            last_attempt_at=("completed_at", "max"),
+            last_passed_at=("passed_at", "max"),
+        )
+        if people is not None:
+            # Chunks come in storage order, so "last" keeps the most recently given name and company.
+            partial = pd.concat([people, partial]).groupby(level=0).agg(
+                name=("name", "last"),
+                company=("company", "last"),
+                last_attempt_at=("last_attempt_at", "max"),
+                last_passed_at=("last_passed_at", "max"),
+            )
+        people = partial
+
+    if people is None:
+        people = pd.DataFrame(columns=["name", "company", "last_attempt_at", "last_passed_at"], dtype=object)
+        people.index.name = "email_key"
+    if roster is not None and not roster.empty:
+        missing = roster.loc[~roster.index.isin(people.index)]
+        people = pd.concat([people, missing.assign(last_attempt_at=np.nan, last_passed_at=np.nan)])
+
+    people["last_attempt_at"] = pd.to_numeric(people["last_attempt_at"])
+    people["last_passed_at"] = pd.to_numeric(people["last_passed_at"])
+    people["expires_at"] = people["last_passed_at"] + INDUCTION_VALIDITY_DAYS * 86400
+    now = now or time.time()
+    people["status"] = np.select(
+        [people["last_passed_at"].isna(), people["expires_at"] < now],
+        [STATUS_NEVER_INDUCTED, STATUS_EXPIRED],
+        STATUS_VALID,
+    )
+    for column in ("last_attempt_at", "last_passed_at", "expires_at"):
+        people[column] = pd.to_datetime(people[column], unit="s", utc=True).dt.tz_convert(REPORT_TIMEZONE)
+    return people.reset_index().rename(columns={"index": "email_key"}).sort_values(["status", "company", "name"])
+
+
+def export_bytes(report, fmt="csv"):
+    """Returns a report as CSV (UTF-8 with BOM, for Excel) or Parquet bytes."""
+    if fmt == "parquet":
+        output = io.BytesIO()
+        report.to_parquet(output, index=False)
+        return output.getvalue()
+    return report.to_csv(index=False).encode("utf-8-sig")
@@ -0,0 +1,205 @@
+import os
+import secrets
+import sqlite3
+import threading
+import time
+from dataclasses import dataclass, field
+
+from content import DEFAULT_SITE
+
+# --- Results Store Settings ---
+RESULTS_PATH = os.environ.get("EHS_RESULTS_PATH", "induction_results.sqlite3")
+INDUCTION_VALIDITY_DAYS = 365  # An induction has to be renewed every 12 months
+BADGE_QR_PREFIX = "EHS-BADGE:"  # Badge QR payload is the prefix followed by the result's badge ID
+
+
+def is_passing(score, total_questions):
+    """Returns whether a quiz score counts as a passed induction (every answer correct)."""
+    return total_questions > 0 and score == total_questions
+
+
+def normalize_email(email):
+    """Returns the form of an email address used for lookups."""
+    return email.strip().lower()
+
+
+def new_badge_id():
+    """Returns a random badge ID; unlike the row ID, it cannot be guessed from other badges."""
+    return secrets.token_urlsafe(16)
+
+
+def badge_payload(badge_id):
+    """Returns the QR payload of the induction badge for a stored result."""
+    return f"{BADGE_QR_PREFIX}{badge_id}"
+
+
+@dataclass
+class InductionResult:
+    """Outcome of one completed induction quiz."""
+
+    name: str
+    company: str
+    email: str
+    score: int
+    total_questions: int
+    completed_at: float = field(default_factory=time.time)
+    site: str = DEFAULT_SITE
+    answers: str = None  # quiz.encode_answers() form, None for results stored before answers were kept
+    bank_fingerprint: str = None  # quiz.bank_fingerprint() of the bank `answers` refers to
+    badge_id: str = field(default_factory=new_badge_id)
+
+    @property
+    def passed(self):
+        return is_passing(self.score, self.total_questions)
+
+
+class ResultsStore:
+    """Durable SQLite store of induction results, indexed by email and company."""
+
+    def __init__(self, path=RESULTS_PATH):
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._lock = threading.Lock()
+        with self._lock:
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute("PRAGMA synchronous=NORMAL")
+            self._conn.execute(
+                f"""
+                CREATE TABLE IF NOT EXISTS induction_results (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    name TEXT NOT NULL,
+                    company TEXT NOT NULL,
+                    email TEXT NOT NULL,
+                    email_key TEXT NOT NULL,
+                    score INTEGER NOT NULL,
+                    total_questions INTEGER NOT NULL,
+                    passed INTEGER NOT NULL,
+                    completed_at REAL NOT NULL,
+                    site TEXT NOT NULL DEFAULT '{DEFAULT_SITE}',
+                    answers TEXT,
+                    badge_id TEXT,
+                    bank_fingerprint TEXT
+                )
+                """
+            )
+            columns = {row[1] for row in self._conn.execute("PRAGMA table_info(induction_results)")}
+            if "site" not in columns:  # Stores created before multi-site support
+                self._conn.execute(
+                    f"ALTER TABLE induction_results ADD COLUMN site TEXT NOT NULL DEFAULT '{DEFAULT_SITE}'"
+                )
+            if "answers" not in columns:  # Stores created before per-question answers were kept
+                self._conn.execute("ALTER TABLE induction_results ADD COLUMN answers TEXT")
+            if "badge_id" not in columns:  # Stores whose badges carried the guessable row ID
+                self._conn.execute("ALTER TABLE induction_results ADD COLUMN badge_id TEXT")
+                missing = self._conn.execute("SELECT id FROM induction_results WHERE badge_id IS NULL").fetchall()
+                self._conn.executemany(
+                    "UPDATE induction_results SET badge_id = ? WHERE id = ?",
+                    [(new_badge_id(), result_id) for (result_id,) in missing],
+                )
+            if "bank_fingerprint" not in columns:  # Stores whose answers did not say which bank they answered
+                self._conn.execute("ALTER TABLE induction_results ADD COLUMN bank_fingerprint TEXT")
+            self._conn.execute(
+                "CREATE UNIQUE INDEX IF NOT EXISTS results_by_badge ON induction_results (badge_id)"
+            )
+            # Both lookups are answered from the index alone, in O(log n).
+            self._conn.execute(
+                "CREATE INDEX IF NOT EXISTS results_by_email ON induction_results (email_key, passed, completed_at)"
+            )
+            self._conn.execute(
+                "CREATE INDEX IF NOT EXISTS results_by_company ON induction_results (company, completed_at)"
+            )
+
+    _INSERT = (
+        "INSERT INTO induction_results "
+        "(name, company, email, email_key, score, total_questions, passed, completed_at, site, answers, badge_id, "
+        "bank_fingerprint) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)"
+    )
+
+    @staticmethod
+    def _row(r):
+        return (
+            r.name,
+            r.company,
+            r.email,
+            normalize_email(r.email),
+            r.score,
+            r.total_questions,
+            int(r.passed),
+            r.completed_at,
+            r.site,
+            r.answers,
+            r.badge_id,
+            r.bank_fingerprint,
+        )
+
+    def add(self, result):
+        """Stores one result and returns its ID."""
+        with self._lock:
+            return self._conn.execute(self._INSERT, self._row(result)).lastrowid
+
+    def add_many(self, results):
+        """Stores several results in a single transaction."""
+        rows = [self._row(r) for r in results]
+        with self._lock:
+            self._conn.execute("BEGIN")
+            try:
+                self._conn.executemany(self._INSERT, rows)
+            except BaseException:
+                self._conn.execute("ROLLBACK")
+                raise
+            self._conn.execute("COMMIT")
+
+    def has_passed(self, email, within_days=INDUCTION_VALIDITY_DAYS, now=None, site=None):
+        """Returns whether `email` passed an induction within the last `within_days` days.
+
+        With `site`, only inductions taken for that site count.
+        """
+        since = (now or time.time()) - within_days * 86400
+        query = "SELECT 1 FROM induction_results WHERE email_key = ? AND passed = 1 AND completed_at >= ?"
+        params = [normalize_email(email), since]
+        if site is not None:
+            query += " AND site = ?"
+            params.append(site)
+        with self._lock:
+            row = self._conn.execute(query + " LIMIT 1", params).fetchone()
+        return row is not None
+
+    def last_passed_at(self, email):
+        """Returns the timestamp of the most recent passed induction for `email`, or None."""
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT MAX(completed_at) FROM induction_results WHERE email_key = ? AND passed = 1",
+                (normalize_email(email),),
+            ).fetchone()
+        return row[0]
+
+    def results_for_company(self, company, since=0.0):
+        """Returns the results recorded for `company` since `since`, most recent first."""
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT name, company, email, score, total_questions, completed_at, site, answers, badge_id "
+                "FROM induction_results WHERE company = ? AND completed_at >= ? ORDER BY completed_at DESC",
+                (company, since),
+            ).fetchall()
+        return [InductionResult(*row) for row in rows]
+
+    def passed_since(self, after_id=0):
+        """Returns (id, badge_id, name, company, completed_at, site) of passed results stored after `after_id`."""
+        with self._lock:
+            return self._conn.execute(
+                "SELECT id, badge_id, name, company, completed_at, site FROM induction_results "
+                "WHERE id > ? AND passed = 1 ORDER BY id",
+                (after_id,),
+            ).fetchall()
+
+
+_results_store = None
+_results_store_lock = threading.Lock()
+
+
+def get_results_store():
+    """Returns the process-wide results store, opening it on first use."""
+    global _results_store
+    with _results_store_lock:
+        if _results_store is None:
+            _results_store = ResultsStore()
+        return _results_store
@@ -0,0 +1,129 @@
+import os
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+
+from metrics import count
+
+# --- Session Limits ---
+# A session idle for longer than this has its state cleared on its next visit; the visitor starts the induction again.
+SESSION_IDLE_SECONDS = float(os.environ.get("EHS_SESSION_IDLE_SECONDS", "1800"))
+# Above this many sessions, the least recently active ones are cleared first (0: no cap).
+MAX_SESSIONS = int(os.environ.get("EHS_MAX_SESSIONS", "1000"))
+SESSION_SWEEP_SECONDS = 5.0  # How often sessions closed by Streamlit are forgotten
+EVICTED_IDS_KEPT = 1000  # Sessions marked for clearing, each cleared and told why on its next visit
+
+
+@dataclass(slots=True)
+class UserInfo:
+    """Personal information a visitor gave before the induction."""
+
+    name: str
+    company: str
+    email: str
+
+
+def _is_open_session(session_id):
+    from streamlit.runtime import Runtime
+
+    # Without a server (bare or AppTest runs), every session the registry saw is still open
+    return not Runtime.exists() or Runtime.instance().is_active_session(session_id)
+
+
+class SessionRegistry:
+    """Last activity of every open session in this process, to clear the state of idle ones.
+
+    The registry never touches another session's state: an idle or excess
+    session is only marked, and clears its own state from its own script
+    thread at its next visit (see clear_session_state). A visitor who comes
+    back is shown the first step again rather than an error. Sessions closed
+    by Streamlit are forgotten at the next sweep, and Streamlit frees their
+    state.
+    """
+
+    def __init__(self, idle_seconds=SESSION_IDLE_SECONDS, max_sessions=MAX_SESSIONS, is_open=_is_open_session):
+        self.idle_seconds = idle_seconds
+        self.max_sessions = max_sessions
+        self._is_open = is_open
+        self._sessions = OrderedDict()  # Session id -> last seen, least recently seen first
+        self._evicted_ids = OrderedDict()  # Marked for clearing and not seen since, oldest first
+        self._evicted = 0
+        self._swept_at = float("-inf")
+        self._lock = threading.Lock()
+
+    def touch(self, session_id, now=None):
+        """Records activity of a session and marks idle or excess sessions for clearing.
+
+        Returns True when this session was marked since its previous visit: the
+        caller must then clear its state.
+        """
+        now = time.monotonic() if now is None else now
+        with self._lock:
+            was_evicted = session_id in self._evicted_ids
+            self._evicted_ids.pop(session_id, None)
+            self._sessions[session_id] = now
+            self._sessions.move_to_end(session_id)
+            if now - self._swept_at >= SESSION_SWEEP_SECONDS:
+                self._swept_at = now
+                for tracked in (self._sessions, self._evicted_ids):
+                    for other_id in [other_id for other_id in tracked if not self._is_open(other_id)]:
+                        if other_id != session_id:
+                            del tracked[other_id]
+
+            victims = []
+            for other_id, last_seen in self._sessions.items():
+                over_cap = self.max_sessions and len(self._sessions) - len(victims) > self.max_sessions
+                if other_id == session_id or not (over_cap or now - last_seen > self.idle_seconds):
+                    break  # Every later session was seen more recently
+                victims.append(other_id)
+            for other_id in victims:
+                del self._sessions[other_id]
+                self._evicted_ids[other_id] = None
+            while len(self._evicted_ids) > EVICTED_IDS_KEPT:
+                self._evicted_ids.popitem(last=False)
+            if was_evicted:
+                self._evicted += 1
+
+        if was_evicted:
+            count("session_evicted")
+        return was_evicted
+
+    def stats(self):
+        """Returns the number of tracked sessions and how many have been cleared so far."""
+        with self._lock:
+            return {"sessions": len(self._sessions), "evicted": self._evicted}
+
+
+def clear_session_state(safe_state):
+    """Clears the calling session's own state, as Streamlit's own "Clear cache" does.
+
+    `safe_state` is the script run's thread-safe wrapper; its lock is held as
+    for any other state access. clear() keeps the metadata of every widget the
+    session rendered, most of an induction session's state, so it is dropped
+    too; widgets are registered again when they are next rendered. Private to
+    Streamlit: returns False, clearing nothing, if it moves.
+    """
+    lock = getattr(safe_state, "_lock", None)
+    state = getattr(safe_state, "_state", None)
+    if lock is None or state is None:
+        return False
+    with lock:
+        state.clear()  # Values, widget values and keys
+        widget_metadata = getattr(getattr(state, "_new_widget_state", None), "widget_metadata", None)
+        if widget_metadata is not None:
+            widget_metadata.clear()
+    return True
+
+
+_session_registry = None
+_session_registry_lock = threading.Lock()
+
+
+def get_session_registry():
+    """Returns the process-wide session registry."""
+    global _session_registry
+    with _session_registry_lock:
+        if _session_registry is None:
+            _session_registry = SessionRegistry()
+        return _session_registry
@@ -0,0 +1,138 @@
+import functools
+import json
+import os
+from dataclasses import dataclass, field
+
+from content import CONTENT_DIR, load_content
+
+# --- Site Settings ---
+SITES_PATH = os.path.join(CONTENT_DIR, "sites.json")
+SITE_QUERY_PARAM = "site"
+
+# Imerys Brand Colors (Based on imerys.com, accessibility-adjusted)
+IMERYS_BLUE = "#002F6C"
+IMERYS_LIGHT_BLUE = "#4DBCE9"
+IMERYS_GRAY = "#4A4A4A"
+IMERYS_WHITE = "#FFFFFF"
+IMERYS_OFF_WHITE = "#F9F9F9"
+
+
+@dataclass(frozen=True)
+class Branding:
+    """Colors used to theme the app for a site."""
+
+    blue: str = IMERYS_BLUE
+    light_blue: str = IMERYS_LIGHT_BLUE
+    gray: str = IMERYS_GRAY
+    white: str = IMERYS_WHITE
+    off_white: str = IMERYS_OFF_WHITE
+
+
+@dataclass(frozen=True)
+class Site:
+    """A plant served by the app, with its branding, images and induction content."""
+
+    id: str
+    name: str
+    language: str
+    logo: str = "imerys_logo.png"
+    site_image: str = None
+    branding: Branding = field(default_factory=Branding)
+
+    @property
+    def content(self):
+        """Returns the compiled induction content of the site (built once per process)."""
+        return load_content(self.id, self.language)
+
+
+@functools.lru_cache(maxsize=None)
+def load_sites():
+    """Loads the site registry once per process. Returns (sites by id, default site id)."""
+    with open(SITES_PATH, encoding="utf-8") as f:
+        raw = json.load(f)
+    sites = {}
+    for site_id, config in raw["sites"].items():
+        branding = Branding(**config.pop("branding", {}))
+        sites[site_id] = Site(id=site_id, branding=branding, **config)
+    return sites, raw["default_site"]
+
+
+def get_site(site_id=None):
+    """Returns the site registered under `site_id`, or the default site for unknown or missing ids.
+
+    Only registered ids ever reach the per-site caches, so arbitrary query
+    parameters cannot make them grow.
+    """
+    sites, default_site = load_sites()
+    return sites.get(site_id) or sites[default_site]
+
+
+@functools.lru_cache(maxsize=None)
+def site_css(site_id):
+    """Returns the theme <style> block of a registered site, rendered once per process."""
+    branding = get_site(site_id).branding
+    return f"""
+        <style>
+        /* General app background and text */
+        .stApp {{
+            background-color: {branding.off_white};
+            color: {branding.gray};
+        }}
+        [data-testid="stHeader"] {{
+            background-color: {branding.blue};
+            color: {branding.white};
+        }}
+        [data-testid="stSidebar"] {{
+            background-color: {branding.blue};
+            color: {branding.white};
+        }}
+        [data-testid="stSidebar"] h1, [data-testid="stSidebar"] h2, [data-testid="stSidebar"] h3 {{
+            color: {branding.white};
+        }}
+        [data-testid="stSidebar"] a {{
+            color: {branding.light_blue};
+        }}
+        [data-testid="stSidebar"] a:hover {{
+            color: {branding.white};
+        }}
+        [data-testid="stSidebar"] [aria-current="true"] {{
+            color: {branding.white};
+            background-color: rgba(255, 255, 255, 0.2);
+        }}
+        .stTextInput > label {{
+            color: {branding.blue};
+        }}
+        .stTextInput > div > input {{
+            border: 2px solid {branding.light_blue};
+            border-radius: 0.25rem;
+            padding: 0.5rem;
+            color: {branding.gray};
+            background-color: {branding.white};
+        }}
+        .stNumberInput > label {{
+            color: {branding.blue};
+        }}
+       .stNumberInput > div > input {{
+            border: 2px solid {branding.light_blue};
+            border-radius: 0.25rem;
+            padding: 0.5rem;
+            color: {branding.gray};
+            background-color: {branding.white};
+        }}
+        .stDownloadButton > button {{
+            background-color: {branding.blue};
+            color: {branding.white};
+            border: none;
+            border-radius: 0.25rem;
+            padding: 0.5rem 1rem;
+            font-weight: bold;
+        }}
+        .stDownloadButton > button:hover {{
+            background-color: {branding.light_blue};
+            color: {branding.white};
+        }}
+        h1, h2, h3, h4, h5, h6 {{
+            color: {branding.blue};
+        }}
+        </style>
+"""
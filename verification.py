@@ -0,0 +1,183 @@
+import threading
+import time
+from dataclasses import dataclass
+from io import BytesIO
+
+import cv2
+import numpy as np
+from PIL import Image, UnidentifiedImageError
+
+from metrics import span
+from permits import PERMIT_QR_PREFIX, get_permit_registry, load_permit_settings
+from results_store import INDUCTION_VALIDITY_DAYS, badge_payload, get_results_store
+
+# --- Scanner Settings ---
+SCAN_MAX_SIDE = 640  # Frames are decoded at this size at most; a QR code held up to the camera stays readable
+SCAN_RETRY_MAX_SIDE = 1600  # Second pass when nothing was found, for small codes in large photos (a whole permit)
+INDEX_REFRESH_SECONDS = 2.0  # How often the index picks up newly issued codes
+
+# --- Scan Outcomes ---
+STATUS_VALID = "valid"
+STATUS_EXPIRED = "expired"
+STATUS_UNKNOWN = "unknown"  # Readable, but not a code this site issued
+STATUS_UNREADABLE = "unreadable"  # No QR code found in the frame
+
+
+@dataclass(frozen=True)
+class Credential:
+    """An issued badge or permit, as the gate needs to see it."""
+
+    kind: str  # "badge" or "permit"
+    label: str  # Permit type, or "Induction de sécurité"
+    holder: str
+    company: str
+    site: str
+    valid_until: float
+
+
+@dataclass
+class ScanResult:
+    """Outcome of checking one scanned frame or typed code."""
+
+    status: str
+    payload: str = None
+    credential: Credential = None
+    decode_ms: float = 0.0
+    lookup_ms: float = 0.0
+
+
+def decode_qr(image_bytes, max_side=SCAN_MAX_SIDE, retry_max_side=SCAN_RETRY_MAX_SIDE):
+    """Returns the text of the QR code in a JPEG/PNG frame, or None (also for a corrupt or non-image upload).
+
+    The frame is reduced to grayscale at most `max_side` pixels before the
+    detector runs. For JPEG, the reduction happens while decoding, so the
+    full-resolution frame is never materialized. If that finds nothing in a
+    frame it had to reduce, it is decoded once more at `retry_max_side`.
+    """
+    with span("qr_decode"):
+        text, reduced = _decode_qr(image_bytes, max_side)
+        if text is None and reduced and retry_max_side > max_side:
+            text, _ = _decode_qr(image_bytes, retry_max_side)
+        return text
+
+
+def _decode_qr(image_bytes, max_side):
+    """Returns (text or None, whether the frame was larger than `max_side`)."""
+    try:
+        image = Image.open(BytesIO(image_bytes))
+        reduced = max(image.size) > max_side
+        image.draft("L", (max_side, max_side))  # JPEG only: decode at 1/2, 1/4 or 1/8 scale, in grayscale
+        image = image.convert("L")
+        image.thumbnail((max_side, max_side), Image.Resampling.BILINEAR)
+    except (UnidentifiedImageError, OSError):  # Not an image, or a truncated/mislabelled one
+        return None, False
+    text, _, _ = _detector().detectAndDecode(np.asarray(image))
+    return text or None, reduced
+
+
+_detector_local = threading.local()
+
+
+def _detector():
+    """Returns this thread's QR detector; OpenCV detectors are not safe to share between threads."""
+    detector = getattr(_detector_local, "detector", None)
+    if detector is None:
+        detector = _detector_local.detector = cv2.QRCodeDetector()
+    return detector
+
+
+class CredentialIndex:
+    """In-memory hash index of issued badges and permits, keyed by QR payload.
+
+    Loaded from the local results store and permit registry on first use, then
+    refreshed incrementally: each refresh only reads rows stored since the
+    previous one. A check is a dictionary lookup and never waits on the network.
+    """
+
+    def __init__(self, results_store=None, permit_registry=None, refresh_interval=INDEX_REFRESH_SECONDS):
+        self._results_store = results_store
+        self._permit_registry = permit_registry
+        self._refresh_interval = refresh_interval
+        self._credentials = {}
+        self._last_result_id = 0
+        self._last_permit_rowid = 0
+        self._refreshed_at = float("-inf")
+        self._lock = threading.Lock()
+
+    def refresh(self):
+        """Adds the badges and permits issued since the previous refresh."""
+        results_store = self._results_store or get_results_store()
+        permit_registry = self._permit_registry or get_permit_registry()
+        templates = load_permit_settings()["templates"]
+        with self._lock:
+            for result_id, badge_id, name, company, completed_at, site in results_store.passed_since(
+                self._last_result_id
+            ):
+                self._credentials[badge_payload(badge_id)] = Credential(
+                    "badge",
+                    "Induction de sécurité",
+                    name,
+                    company,
+                    site,
+                    completed_at + INDUCTION_VALIDITY_DAYS * 86400,
+                )
+                self._last_result_id = result_id
+            for rowid, permit_id, template_id, holder, company, site, valid_until in permit_registry.issued_since(
+                self._last_permit_rowid
+            ):
+                template = templates.get(template_id)
+                self._credentials[f"{PERMIT_QR_PREFIX}{permit_id}"] = Credential(
+                    "permit",
+                    template["title"] if template else template_id,
+                    holder or "",
+                    company or "",
+                    site,
+                    valid_until,
+                )
+                self._last_permit_rowid = rowid
+            self._refreshed_at = time.monotonic()
+
+    def __len__(self):
+        return len(self._credentials)
+
+    def lookup(self, payload):
+        """Returns the credential for a scanned payload, or None if it was never issued."""
+        if time.monotonic() - self._refreshed_at >= self._refresh_interval:
+            self.refresh()
+        return self._credentials.get(payload.strip())
+
+    def check(self, payload, now=None):
+        """Checks a payload and returns a ScanResult (without decode timing)."""
+        started = time.perf_counter()
+        credential = self.lookup(payload)
+        if credential is None:
+            status = STATUS_UNKNOWN
+        elif credential.valid_until is not None and credential.valid_until < (now or time.time()):
+            status = STATUS_EXPIRED
+        else:
+            status = STATUS_VALID
+        return ScanResult(status, payload, credential, lookup_ms=(time.perf_counter() - started) * 1000)
+
+    def scan(self, image_bytes, now=None):
+        """Decodes a camera or uploaded frame and checks the code it contains."""
+        started = time.perf_counter()
+        payload = decode_qr(image_bytes)
+        decode_ms = (time.perf_counter() - started) * 1000
+        if payload is None:
+            return ScanResult(STATUS_UNREADABLE, decode_ms=decode_ms)
+        result = self.check(payload, now)
+        result.decode_ms = decode_ms
+        return result
+
+
+_credential_index = None
+_credential_index_lock = threading.Lock()
+
+
+def get_credential_index():
+    """Returns the process-wide credential index, shared by every scanning session."""
+    global _credential_index
+    with _credential_index_lock:
+        if _credential_index is None:
+            _credential_index = CredentialIndex()
+        return _credential_index
@@ -0,0 +1,165 @@
+import importlib
+import json
+import os
+import sys
+import threading
+import time
+
+# --- Warm-up Settings ---
+WARMUP_ENABLED = os.environ.get("EHS_WARMUP", "") == "1"
+# Extra payloads to pre-render, comma-separated; the QR page's default text is always included.
+WARMUP_QR_TEXTS = [text for text in os.environ.get("EHS_WARMUP_QR", "").split(",") if text]
+# Imported by the warm-up so that no page pays for them on its first render.
+HEAVY_MODULES = (
+    "qrcode",
+    "PIL.Image",
+    "smtplib",
+    "email.mime.text",
+    "qr_codes",
+    "qr_batch",
+    "quiz",
+    "results_store",
+    "mailer",
+    "permits",
+    "verification",
+)
+
+_report = {"warmup": {"enabled": WARMUP_ENABLED, "status": "disabled" if not WARMUP_ENABLED else "pending"}}
+_first_renders = {}
+_report_lock = threading.Lock()
+_warmup_thread = None
+_warmup_thread_lock = threading.Lock()
+
+
+def _process_age():
+    """Returns the seconds since this process started, or None where /proc is not available."""
+    try:
+        with open("/proc/self/stat") as f:
+            # Field 22 (after the parenthesized command name) is the start time in clock ticks since boot.
+            start_ticks = int(f.read().rsplit(")", 1)[1].split()[19])
+        with open("/proc/uptime") as f:
+            uptime = float(f.read().split()[0])
+    except (OSError, IndexError, ValueError):
+        return None
+    return round(uptime - start_ticks / os.sysconf("SC_CLK_TCK"), 2)
+
+
+# Imported with the first script run, so this is how long the server took to serve its first session.
+_report["process_age_at_first_run_s"] = _process_age()
+
+
+def _log(event, **fields):
+    print(json.dumps({"event": event, **fields}, ensure_ascii=False), file=sys.stderr, flush=True)
+
+
+def _import_heavy_modules():
+    for name in HEAVY_MODULES:
+        importlib.import_module(name)
+
+
+def _compile_content():
+    from content import load_content
+    from sites import load_sites, site_css
+
+    sites, _ = load_sites()
+    for site in sites.values():
+        load_content(site.id, site.language)
+        site_css(site.id)
+
+
+def _decode_assets():
+    from assets import CONTENT_IMAGE_WIDTH, LOGO_WIDTH, asset_registry
+    from sites import load_sites
+
+    sites, _ = load_sites()
+    for site in sites.values():
+        asset_registry.get(site.logo, LOGO_WIDTH)
+        if site.site_image:
+            asset_registry.get(site.site_image, CONTENT_IMAGE_WIDTH)
+        for section in site.content.sections.values():
+            if section.image:
+                asset_registry.get(section.image.path, CONTENT_IMAGE_WIDTH)
+
+
+def _prebuild_qr_codes(texts):
+    from qr_codes import DEFAULT_TEXT, qr_cache
+
+    for text in [DEFAULT_TEXT, *texts]:
+        qr_cache.get_png(text)
+        qr_cache.get_svg(text)
+
+
+def _compile_permit_templates():
+    from permits import compile_template, load_permit_settings
+    from sites import load_sites
+
+    sites, _ = load_sites()
+    for template_id in load_permit_settings()["templates"]:
+        for site in sites.values():
+            compile_template(template_id, site.name)
+
+
+def _load_credential_index():
+    from verification import get_credential_index
+
+    get_credential_index().refresh()
+
+
+def warm_up(qr_texts=WARMUP_QR_TEXTS):
+    """Fills the process-wide caches ahead of the first visitors. Returns the duration of each step (ms)."""
+    steps = [
+        ("imports", _import_heavy_modules),
+        ("content_css", _compile_content),
+        ("assets", _decode_assets),
+        ("qr_codes", lambda: _prebuild_qr_codes(qr_texts)),
+        ("permit_templates", _compile_permit_templates),
+        ("credential_index", _load_credential_index),
+    ]
+    durations = {}
+    for name, func in steps:
+        started = time.perf_counter()
+        func()
+        durations[name] = round((time.perf_counter() - started) * 1000, 1)
+    return durations
+
+
+def _run_warmup():
+    started = time.perf_counter()
+    with _report_lock:
+        _report["warmup"]["status"] = "running"
+    try:
+        steps_ms = warm_up()
+    except Exception as e:  # A failed warm-up only means colder first renders
+        with _report_lock:
+            _report["warmup"].update(status="failed", error=repr(e))
+        _log("warmup_failed", error=repr(e))
+        return
+    total_ms = round((time.perf_counter() - started) * 1000, 1)
+    with _report_lock:
+        _report["warmup"].update(status="done", steps_ms=steps_ms, total_ms=total_ms)
+    _log("warmup_done", steps_ms=steps_ms, total_ms=total_ms)
+
+
+def start_warmup():
+    """Starts the warm-up in a background thread, once per process, when EHS_WARMUP=1."""
+    global _warmup_thread
+    with _warmup_thread_lock:
+        if _warmup_thread is None and WARMUP_ENABLED:
+            _warmup_thread = threading.Thread(target=_run_warmup, name="ehs-warmup", daemon=True)
+            _warmup_thread.start()
+        return _warmup_thread
+
+
+def record_first_render(page, seconds):
+    """Remembers how long the first render of `page` took in this process."""
+    with _report_lock:
+        if page in _first_renders:
+            return
+        _first_renders[page] = round(seconds * 1000, 1)
+    _log("first_render", page=page, ms=_first_renders[page])
+
+
+def startup_report():
+    """Returns the process start-up timings: warm-up steps and the first render of each page."""
+    with _report_lock:
+        return {**_report, "warmup": dict(_report["warmup"]), "first_render_ms": dict(_first_renders)}